@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+
+import metrics
+
+# Admission control for the parse endpoints. Before parsing, each upload gets a cost in pages (its
+# page count, or more for a file that is large for its pages, e.g. scans that need OCR) and it
+# only starts while the cost of everything in flight fits the budget; otherwise it waits in a
+# short queue. Small documents have their own lane: they are admitted ahead of waiting larger
+# ones and may use the last ADMISSION_SMALL_RESERVE of the budget, so a burst of huge uploads
+# can't hold up 3-page POs. A document bigger than the whole budget runs when nothing else does.
+# When the queue is full, or a request can't be admitted within ADMISSION_MAX_WAIT seconds, it
+# is rejected (429 with Retry-After in the API).
+# Pages in flight; 0 turns admission control off
+ADMISSION_BUDGET = int(os.environ.get("PDF_ADMISSION_BUDGET", 400))
+# Documents costing at most this many pages use the small-document lane
+ADMISSION_SMALL_PAGES = int(os.environ.get("PDF_ADMISSION_SMALL_PAGES", 10))
+# Share of the budget only small documents can use
+ADMISSION_SMALL_RESERVE = float(os.environ.get("PDF_ADMISSION_SMALL_RESERVE", 0.25))
+# Waiting requests hold a server thread each, so the queue stays short
+ADMISSION_MAX_QUEUE = int(os.environ.get("PDF_ADMISSION_MAX_QUEUE", 32))
+ADMISSION_MAX_WAIT = float(os.environ.get("PDF_ADMISSION_MAX_WAIT", 5))
+# A file counts as at least one page per this many bytes
+ADMISSION_BYTES_PER_PAGE = int(os.environ.get("PDF_ADMISSION_BYTES_PER_PAGE", 256 * 1024))
+
+# Parse seconds per page assumed for Retry-After until parses have been timed
+DEFAULT_SECONDS_PER_PAGE = 0.1
+RETRY_AFTER_MAX = 60
+
+LANES = ("small", "large")
+
+ADMISSIONS = metrics.REGISTRY.counter("pdf_admissions_total", "Parse requests by lane and outcome (admitted / queue_full / timeout)", ("lane", "outcome"))
+ADMISSION_WAIT = metrics.REGISTRY.histogram("pdf_admission_wait_seconds", "Time parse requests waited for admission", ("lane",))
+
+
+def estimate_cost(pages, size):
+    # Pages the parse is charged for; pages is None when the page tree couldn't be read
+    return max(1, pages or 0, math.ceil(size / ADMISSION_BYTES_PER_PAGE))
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason.replace('_', ' ')}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    # An admitted request; release it (or leave its `with` block) when the parse is over
+    __slots__ = ("controller", "cost", "lane", "start", "_released")
+
+    def __init__(self, controller, cost, lane):
+        self.controller = controller
+        self.cost = cost
+        self.lane = lane
+        self.start = time.perf_counter()
+        self._released = controller is None
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self.cost, time.perf_counter() - self.start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    # A streamed response that is dropped before it starts never runs its cleanup
+    __del__ = release
+
+
+class AdmissionController:
+    """Pages in flight against a budget, with a priority queue (small documents first, then FIFO)."""
+
+    def __init__(self, budget=ADMISSION_BUDGET, small_pages=ADMISSION_SMALL_PAGES, small_reserve=ADMISSION_SMALL_RESERVE,
+                 max_queue=ADMISSION_MAX_QUEUE, max_wait=ADMISSION_MAX_WAIT):
+        self.budget = budget
+        self.large_budget = budget - int(budget * small_reserve)
+        self.small_pages = small_pages
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.running = 0
+        self.seconds_per_page = DEFAULT_SECONDS_PER_PAGE
+        self._waiting = []
+        self._queued_pages = 0
+        self._seq = itertools.count()
+        self._counts = {lane: {"admitted": 0, "queue_full": 0, "timeout": 0} for lane in LANES}
+        self._cond = threading.Condition()
+
+    def lane(self, cost):
+        return "small" if cost <= self.small_pages else "large"
+
+    def _fits(self, cost, lane):
+        limit = self.budget if lane == "small" else self.large_budget
+        return self.in_flight + cost <= limit or self.running == 0
+
+    def _retry_after(self, cost, lane):
+        # Seconds until enough of the work ahead (in flight and queued) should be done
+        limit = self.budget if lane == "small" else self.large_budget
+        excess = self.in_flight + self._queued_pages + cost - limit
+        return min(RETRY_AFTER_MAX, max(1, math.ceil(excess * self.seconds_per_page)))
+
+    def _reject(self, reason, cost, lane):
+        self._counts[lane][reason] += 1
+        ADMISSIONS.inc(1, lane, reason)
+        raise Rejected(reason, self._retry_after(cost, lane))
+
+    def acquire(self, cost):
+        # Ticket once the request may parse; raises Rejected when it can't be admitted in time
+        lane = self.lane(cost)
+        if self.budget <= 0:
+            return Ticket(None, cost, lane)
+        start = time.perf_counter()
+        with self._cond:
+            if self._waiting or not self._fits(cost, lane):
+                if len(self._waiting) >= self.max_queue:
+                    self._reject("queue_full", cost, lane)
+                entry = (LANES.index(lane), next(self._seq), cost)
+                heapq.heappush(self._waiting, entry)
+                self._queued_pages += cost
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while not (self._waiting[0] is entry and self._fits(cost, lane)):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("timeout", cost, lane)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._queued_pages -= cost
+                    # The next in line may fit now
+                    self._cond.notify_all()
+            self.in_flight += cost
+            self.running += 1
+            self._counts[lane]["admitted"] += 1
+        ADMISSIONS.inc(1, lane, "admitted")
+        ADMISSION_WAIT.observe(time.perf_counter() - start, lane)
+        return Ticket(self, cost, lane)
+
+    def _release(self, cost, seconds):
+        with self._cond:
+            self.in_flight -= cost
+            self.running -= 1
+            self.seconds_per_page = 0.8 * self.seconds_per_page + 0.2 * seconds / cost
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            queued = {lane: 0 for lane in LANES}
+            for rank, _, _ in self._waiting:
+                queued[LANES[rank]] += 1
+            return {
+                "budget_pages": self.budget,
+                "large_budget_pages": self.large_budget,
+                "small_pages": self.small_pages,
+                "in_flight_pages": self.in_flight,
+                "running": self.running,
+                "queued": queued,
+                "queued_pages": self._queued_pages,
+                "seconds_per_page": round(self.seconds_per_page, 4),
+                "lanes": {lane: dict(counts) for lane, counts in self._counts.items()},
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
@@ -1,40 +1,476 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-import shutil
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.formparsers import MultiPartParser
+from typing import List, Optional
 import os
-import subprocess
-import json
+import io
+import uuid
+import functools
+import hashlib
+import zipfile
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import wait
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+import jobs
+import admission
+import warmup
+import cache
+import metrics
+import formats
 
-app = FastAPI()
+try:
+    from PyPDF2 import PdfReader
+except ImportError:  # page limits are then only known once the parser opens the file
+    PdfReader = None
 
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Load extracted JSON data
-def load_data():
-    with open('combined.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+# ✅ Warm-up before the first request is accepted: parser imports (which compile their patterns), one sample parse
+# and the job pool's workers. Only the server's startup runs this; `import api` stays cheap.
+@asynccontextmanager
+async def lifespan(app):
+    if warmup.WARMUP_ENABLED:
+        start = time.perf_counter()
+        await run_in_threadpool(warmup.warm_up)
+        if warmup.WARMUP_JOB_POOL:
+            workers = await run_in_threadpool(jobs.get_queue().warm)
+            print(f"🔥 Job pool started with {workers} warm worker(s)")
+        print(f"🚀 Ready in {time.perf_counter() - start:.3f}s")
+    yield
+    jobs.get_queue().shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BATCH_MAX_FILES = int(os.environ.get("PDF_BATCH_MAX_FILES", 100))
+# Total size of the PDFs in a batch, zip members counted at their uncompressed size
+BATCH_MAX_BYTES = int(os.environ.get("PDF_BATCH_MAX_BYTES", 500 * 1024 * 1024))
+# Per-PDF limits, checked before any parsing starts
+MAX_UPLOAD_BYTES = int(os.environ.get("PDF_MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 1000))
+# Uploads are spooled by the multipart parser: in memory up to this size, then in a private temp file.
+# The parser reads that spool directly, so nothing is written under a client-chosen name.
+UPLOAD_SPOOL_BYTES = int(os.environ.get("PDF_UPLOAD_SPOOL_BYTES", 4 * 1024 * 1024))
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+# Multipart boundaries, part headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+# ✅ Request latency by route template (not raw path, so job ids don't explode the label set)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not metrics.ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, getattr(route, "path", "unmatched"), str(status))
+
+
+# ✅ Body size limit, enforced as the body arrives rather than after Starlette has spooled it:
+# a declared Content-Length over the limit is refused before anything is read, and a body
+# without one (chunked) is cut off as soon as it passes the limit
+class BodySizeLimit:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = body_limit(scope["path"])
+        too_large = JSONResponse({"detail": f"Request body larger than {limit} bytes"}, status_code=413)
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await too_large(scope, receive, send)
+
+        received, rejected = 0, False
+
+        # Past the limit the client gets the 413 right away and the app sees a disconnect,
+        # so it stops reading; whatever it still sends or raises is dropped
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    await too_large(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+# Largest body a route accepts: its file limit plus room for the multipart framing
+def body_limit(path):
+    return (BATCH_MAX_BYTES if path.rstrip("/") == "/batch" else MAX_UPLOAD_BYTES) + MULTIPART_OVERHEAD_BYTES
+
+
+app.add_middleware(BodySizeLimit)
+
+
+# ✅ Output encoding: ?format=json|ndjson|msgpack|csv, else the Accept header, else compact JSON.
+# Checked before parsing so an unsupported request fails fast with 406.
+def output_format(request, format=None, layout="records"):
+    if layout not in formats.LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown layout {layout!r}, expected one of {formats.LAYOUTS}")
+    try:
+        return formats.negotiate(format, request.headers.get("accept"))
+    except formats.UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+# Encode the records here (instead of letting FastAPI do it) so the output stage is timed
+def encoded_response(records, fmt="json", layout="records"):
+    with metrics.stage("output"):
+        body = formats.render(records, fmt, layout)
+    return Response(content=body, media_type=formats.MEDIA_TYPES[fmt])
+
+
+# Hash an upload in chunks (for the result cache) while enforcing the size limit, then rewind it
+def check_upload(file):
+    hasher = hashlib.sha256()
+    size = 0
+    file.file.seek(0)
+    for chunk in iter(lambda: file.file.read(UPLOAD_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File larger than {MAX_UPLOAD_BYTES} bytes")
+        hasher.update(chunk)
+    file.file.seek(0)
+    return hasher.hexdigest()
+
+
+# Page count from the PDF's page tree, without extracting anything; None if it can't be read
+def count_pages(stream):
+    if PdfReader is None:
+        return None
+    try:
+        return len(PdfReader(stream, strict=False).pages)
+    except Exception:
+        return None
+    finally:
+        stream.seek(0)
+
+
+def check_page_count(stream):
+    pages = count_pages(stream)
+    if pages is not None and pages > MAX_PAGES:
+        raise HTTPException(status_code=413, detail=f"PDF has {pages} pages, at most {MAX_PAGES} allowed")
+    return pages
+
+
+# ✅ Admission control: a parse (cache miss) starts only while the pages in flight fit the budget,
+# small documents first; a request that can't get in soon enough gets 429 with Retry-After
+def admit_upload(stream, pages):
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    try:
+        return admission.get_controller().acquire(admission.estimate_cost(pages, size))
+    except admission.Rejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+# Parse an uploaded PDF (or reuse the cached result for the same bytes)
+def parse_upload(file):
+    digest = check_upload(file)
+
+    # Same bytes and same parser version -> reuse the stored result
+    cached = cache.get_cache().get(digest)
+    if cached is not None:
+        file.file.close()
+        return cached
+
+    # Run your main parser on the spooled upload and respond straight from its result
+    try:
+        pages = check_page_count(file.file)
+        with admit_upload(file.file, pages):
+            import main
+            result = main.run_from_api(file.file)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running parser: {str(e)}")
+    finally:
+        file.file.close()
+
+    if result:
+        cache.get_cache().put(digest, result)
+    return result
+
 
 @app.post("/")
-def upload_pdf(file: UploadFile = File(...)):
+def upload_pdf(request: Request, file: UploadFile = File(...), format: Optional[str] = None, layout: str = "records"):
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+
+    fmt = output_format(request, format, layout)
+    return encoded_response(parse_upload(file), fmt, layout)
+
+
+# ✅ Export: same parse, but by default each general-info block is stored once and items point to it
+@app.post("/export")
+def export_pdf(request: Request, file: UploadFile = File(...), format: Optional[str] = None, layout: str = "flat"):
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+
+    fmt = output_format(request, format, layout)
+    return encoded_response(parse_upload(file), fmt, layout)
+
+
+# ✅ Streaming mode: newline-delimited JSON, one record per line as soon as it is parsed
+@app.post("/stream")
+def stream_pdf(file: UploadFile = File(...)):
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+
+    digest = check_upload(file)
+    cached = cache.get_cache().get(digest)
+    ticket = None
+    if cached is None:
+        ticket = admit_upload(file.file, check_page_count(file.file))
+
+    def _ndjson():
+        try:
+            if cached is not None:
+                records = cached
+            else:
+                import main
+                records = main.iter_combined_pdf(file.file)
+
+            collected = []
+            for record in records:
+                collected.append(record)
+                with metrics.stage("output"):
+                    line = formats.encode_json(record) + b"\n"
+                yield line
+            if cached is None and collected:
+                cache.get_cache().put(digest, collected)
+        finally:
+            if ticket is not None:
+                ticket.release()
+            file.file.close()
+
+    # The admission is held while the records stream, and freed after the response in any case
+    background = BackgroundTask(ticket.release) if ticket is not None else None
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson", background=background)
+
+
+# Expand a batch upload into (name, size, read) entries without reading any document yet;
+# zip archives contribute every PDF inside them, sized by what their directory declares.
+# The per-PDF limit applies to each PDF and zip member; archives only count towards the batch total.
+def collect_batch_documents(name, stream, documents, errors):
+    if name.lower().endswith(".pdf"):
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        if size > MAX_UPLOAD_BYTES:
+            errors[name] = {"status": "failed", "error": f"File larger than {MAX_UPLOAD_BYTES} bytes"}
+            return
+        documents.append((name, size, stream.read))
+    elif name.lower().endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(stream)
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                    continue
+                if member.file_size > MAX_UPLOAD_BYTES:
+                    errors[f"{name}/{member.filename}"] = {"status": "failed", "error": f"File larger than {MAX_UPLOAD_BYTES} bytes"}
+                    continue
+                # zipfile stops reading a member at its declared size
+                documents.append((f"{name}/{member.filename}", member.file_size, functools.partial(archive.read, member)))
+        except zipfile.BadZipFile as e:
+            errors[name] = {"status": "failed", "error": f"Invalid zip file: {e}"}
+    else:
+        errors[name] = {"status": "failed", "error": "Only PDF or zip files allowed"}
+
+
+# ✅ Batch mode: many PDFs (or zips of PDFs) parsed concurrently on the worker pool.
+# A plain def, so hashing, page counting and unzipping run in the threadpool, not on the event loop.
+@app.post("/batch")
+def upload_batch(files: List[UploadFile] = File(...)):
+    try:
+        return _parse_batch(files)
+    finally:
+        for file in files:
+            file.file.close()
+
+
+def _parse_batch(files):
+    documents, results = [], {}
+    for file in files:
+        collect_batch_documents(file.filename, file.file, documents, results)
+    # Both limits are checked before any document (or zip member) is read
+    if len(documents) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} PDFs per batch")
+    if sum(size for _, size, _ in documents) > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch larger than {BATCH_MAX_BYTES} bytes")
+
+    queue = jobs.get_queue()
+    pending, scheduled = [], {}
+    for name, _, read in documents:
+        # A corrupt, encrypted or badly compressed zip member only fails itself
+        try:
+            data = read()
+        except Exception as e:
+            results[name] = {"status": "failed", "error": f"Could not read file: {e}"}
+            continue
+        digest = cache.content_digest(data)
+        if name in results:
+            name = f"{name}#{digest[:12]}"
+        results[name] = {"sha256": digest}
+        cached = cache.get_cache().get(digest)
+        if cached is not None:
+            results[name].update(status="done", cached=True, result=cached)
+            continue
+        pages = count_pages(io.BytesIO(data))
+        if pages is not None and pages > MAX_PAGES:
+            results[name].update(status="failed", error=f"PDF has {pages} pages, at most {MAX_PAGES} allowed")
+            continue
+        # Identical files in one batch are parsed once
+        if digest not in scheduled:
+            scheduled[digest] = queue.run(data)
+        pending.append((name, digest))
+
+    wait(scheduled.values())
+    outcomes = {digest: future.exception() or future.result() for digest, future in scheduled.items()}
+    for digest, outcome in outcomes.items():
+        if outcome and not isinstance(outcome, BaseException):
+            cache.get_cache().put(digest, outcome)
+
+    for name, digest in pending:
+        outcome = outcomes[digest]
+        if isinstance(outcome, BaseException):
+            results[name].update(status="failed", error=f"Error running parser: {outcome}")
+        elif not outcome:
+            results[name].update(status="failed", error="No valid data extracted")
+        else:
+            results[name].update(status="done", cached=False, result=outcome)
+
+    failed = sum(1 for r in results.values() if r["status"] == "failed")
+    summary = {"total": len(results), "succeeded": len(results) - failed, "failed": failed}
+    return Response(content=formats.encode_json({"files": results, "summary": summary}), media_type="application/json")
+
+
+# ✅ Job-based mode: accept the PDF, parse it in a worker process, poll for the result
+@app.post("/jobs", status_code=202)
+def create_job(file: UploadFile = File(...)):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files allowed")
 
-    save_path = os.path.join(UPLOAD_FOLDER, file.filename)
+    job_id = uuid.uuid4().hex
+    digest = check_upload(file)
+
+    cached = cache.get_cache().get(digest)
+    if cached is not None:
+        jobs.get_queue().complete(cached, job_id=job_id)
+    else:
+        check_page_count(file.file)
+
+        def _store(result):
+            if result:
+                cache.get_cache().put(digest, result)
+
+        # Workers get the bytes themselves, so nothing has to outlive this request on disk
+        with file.file:
+            data = file.file.read()
+        jobs.get_queue().submit(data, job_id=job_id, on_result=_store)
+    return jobs.get_queue().status(job_id)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    status = jobs.get_queue().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return status
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, request: Request, format: Optional[str] = None, layout: str = "records"):
+    fmt = output_format(request, format, layout)
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
 
-    # Save uploaded file
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    future = job["future"]
+    if not future.done():
+        raise HTTPException(status_code=409, detail=f"Job is {jobs.get_queue().status(job_id)['status']}")
+    if future.exception():
+        raise HTTPException(status_code=500, detail=f"Error running parser: {future.exception()}")
+    return encoded_response(future.result(), fmt, layout)
 
-    # Run your main parser on this file
+
+# ✅ Revisions: a re-sent PO (same Order No) only re-extracts the pages that changed, and the
+# response lists the items added, removed and modified since the previous revision
+@app.post("/revisions")
+def upload_revision(file: UploadFile = File(...)):
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+
+    digest = check_upload(file)
     try:
-        import main
-        main.run_from_api(save_path)  # call your function that accepts a file path
+        pages = check_page_count(file.file)
+        with admit_upload(file.file, pages):
+            import revisions
+            payload = revisions.parse_revision(file.file, digest)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error running parser: {str(e)}")
+    finally:
+        file.file.close()
+    return Response(content=formats.encode_json(payload), media_type="application/json")
+
+
+@app.get("/revisions/{order_no}")
+def get_revision(order_no: str):
+    import revisions
+    summary = revisions.get_store().summary(order_no)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Unknown order number")
+    return summary
+
+
+# ✅ Admission state: pages in flight, queue depth per lane, admitted / rejected counts
+@app.get("/admission/stats")
+def get_admission_stats():
+    return admission.get_controller().stats()
+
+
+# ✅ Result cache counters and invalidation (e.g. after changing parser rules)
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache.get_cache().stats()
+
 
-    return load_data()
+@app.delete("/cache")
+def clear_cache():
+    return {"removed": cache.get_cache().invalidate()}
 
 
+@app.delete("/cache/{digest}")
+def invalidate_cache_entry(digest: str):
+    return {"removed": cache.get_cache().invalidate(digest)}
 
-    
 
+# ✅ Prometheus scrape endpoint: stage latencies, throughput, items per document, errors
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
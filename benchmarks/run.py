@@ -0,0 +1,242 @@
+# Parser benchmarks on synthetic POs: per-stage timings, throughput and peak memory as JSON.
+#   python benchmarks/run.py                      # all scenarios -> benchmark-results.json
+#   python benchmarks/run.py --quick --check      # fail (exit 1) on a regression vs baseline.json
+#   python benchmarks/run.py --update-baseline    # after an intended change
+# --check compares throughput relative to a calibration workload timed right before and after
+# each run, so the baseline holds on a faster or slower (or busier) machine than the one it came from.
+import io
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Run from anywhere: the parser modules live one directory up
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from synthetic import build_po_pdf  # noqa: E402
+import main  # noqa: E402
+import pdftext  # noqa: E402
+from pdftext import PdfDocument  # noqa: E402
+from master import extract_master_metadata  # noqa: E402
+from records import GeneralInfo  # noqa: E402
+from partone import extract_blocks, parse_block  # noqa: E402
+from parttwo import ARTICLE_HEADING, extract_general_info_blocks, extract_product_blocks  # noqa: E402
+from parttwo import parse_general_info, parse_product_block  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+
+# name: generator arguments. Both layouts, from a few pages to a few hundred.
+SCENARIOS = {
+    "no_heading_small": dict(items=3),
+    "no_heading_80_pages": dict(items=40, min_pages=80),
+    "heading_small": dict(items=20, with_heading=True),
+    "heading_without_style": dict(items=20, with_heading=True, sections=2, general_style=False),
+    "heading_40_pages": dict(items=500, with_heading=True, sections=10),
+    "heading_150_pages": dict(items=2000, with_heading=True, sections=40),
+}
+QUICK_SCENARIOS = ("no_heading_small", "heading_small", "heading_without_style", "heading_40_pages")
+
+STAGES = ("open", "text_extraction", "master_metadata", "segmentation", "field_parsing", "serialization")
+
+# A run fails the check when throughput drops or peak memory grows by more than this fraction
+DEFAULT_TOLERANCE = 0.25
+
+# Fixed pure-Python work of the kind the parser does (regex scans, string and dict handling),
+# independent of the parser code; its time measures how fast this machine is right now
+CALIBRATION_TEXT = "\n".join(f"{i}) ARTICLE {i} EAN CODE: {i:013d}  QUANTITY: {i % 97} PCS" for i in range(2000))
+CALIBRATION_LINE = re.compile(r'^(\d+)\) ARTICLE (\d+) EAN CODE: (\d+)\s+QUANTITY: (\d+) PCS$', re.MULTILINE)
+CALIBRATION_ROUNDS = 10
+# Calibration runs on each side of a timed parse; their median is what the parse is compared to
+CALIBRATION_RUNS = 5
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return time.perf_counter() - start, value
+
+
+def _calibration_workload():
+    for _ in range(CALIBRATION_ROUNDS):
+        totals = {}
+        for match in CALIBRATION_LINE.finditer(CALIBRATION_TEXT):
+            key = match.group(4)
+            totals[key] = totals.get(key, 0) + len(match.group(3).strip().lower().split("0"))
+        json.dumps(totals)
+
+
+def _calibration_times():
+    return [_timed(_calibration_workload)[0] for _ in range(CALIBRATION_RUNS)]
+
+
+def extract_text(doc, layout):
+    # The page text each layout asks for: master pages, then every page (heading) or pages 3-6
+    for n in range(min(3, len(doc))):
+        doc.page_text(n)
+    if layout == "heading":
+        doc.prefetch(range(len(doc)), x_tolerance=3)
+    else:
+        doc.prefetch(range(2, min(6, len(doc))), x_tolerance=2)
+
+
+def segment(doc, layout):
+    if layout == "heading":
+        text = "".join(main.iter_page_chunks(doc))
+        match = ARTICLE_HEADING.search(text)
+        sections = extract_general_info_blocks(text[match.start():])
+        return [(section, extract_product_blocks(section)) for section in sections]
+    text = "".join(doc.page_text(n, x_tolerance=2) + "\n" for n in range(2, min(6, len(doc))))
+    return extract_blocks(text)
+
+
+def parse_fields(segments, layout):
+    records = []
+    if layout == "heading":
+        for section, blocks in segments:
+            general_info = parse_general_info(section)
+            general_info.pop("Total quantity of articles", None)
+            general_info = GeneralInfo(general_info)
+            records.extend(parse_product_block(block, general_info) for block in blocks)
+    else:
+        records.extend(parse_block(block) for block in segments)
+    return records
+
+
+def run_stages(data, layout):
+    # One pass through the stages on a fresh document; later stages reuse the cached page text
+    times = {}
+    times["open"], doc = _timed(lambda: PdfDocument(data, workers=0))
+    try:
+        times["open"] += _timed(len, doc)[0]
+        times["text_extraction"], _ = _timed(extract_text, doc, layout)
+        times["master_metadata"], _ = _timed(extract_master_metadata, doc)
+        times["segmentation"], segments = _timed(segment, doc, layout)
+        times["field_parsing"], _ = _timed(parse_fields, segments, layout)
+        result = main.parse_combined_pdf(doc)
+        times["serialization"], payload = _timed(lambda: json.dumps(result, indent=4, ensure_ascii=False))
+    finally:
+        doc.close()
+    return times, len(result), len(payload)
+
+
+def run_scenario(name, repeat):
+    options = SCENARIOS[name]
+    data = build_po_pdf(**options)
+    layout = "heading" if options.get("with_heading") else "no_heading"
+    with redirect_stdout(io.StringIO()):
+        pages = len(PdfDocument(data, workers=0))
+        best = dict.fromkeys(STAGES, float("inf"))
+        for _ in range(repeat):
+            times, records, payload_bytes = run_stages(data, layout)
+            for stage in STAGES:
+                best[stage] = min(best[stage], times[stage])
+
+        # End to end, as the API runs it, each run between calibration runs: the best wall time and
+        # the best ratio to the median calibration time, then peak memory in a separate traced run
+        total = relative = float("inf")
+        for _ in range(repeat):
+            before = _calibration_times()
+            seconds = _timed(main.parse_combined_pdf, data)[0]
+            calibration = statistics.median(before + _calibration_times())
+            total = min(total, seconds)
+            relative = min(relative, seconds / calibration)
+        tracemalloc.start()
+        main.parse_combined_pdf(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "layout": layout,
+        "pages": pages,
+        "pdf_bytes": len(data),
+        "records": records,
+        "json_bytes": payload_bytes,
+        "stages": {stage: round(best[stage], 6) for stage in STAGES},
+        "total_seconds": round(total, 6),
+        "pages_per_second": round(pages / total, 3),
+        # Pages parsed in the time of one calibration run: comparable across machines
+        "pages_per_calibration": round(pages / relative, 4),
+        "peak_memory_bytes": peak,
+    }
+
+
+def check(results, baseline, tolerance):
+    # Lost items, then regressions in calibrated throughput or peak memory against the stored baseline, as messages
+    failures = []
+    for name, result in results["scenarios"].items():
+        items = SCENARIOS[name]["items"]
+        if result["records"] < items:
+            failures.append(f"{name}: {result['records']} records for {items} generated items")
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if "pages_per_calibration" not in base:
+            print(f"⚠️ {name}: baseline has no calibrated throughput, not checked (run --update-baseline)", file=sys.stderr)
+        elif result["pages_per_calibration"] < base["pages_per_calibration"] * (1 - tolerance):
+            failures.append(f"{name}: {result['pages_per_calibration']} pages per calibration run, "
+                            f"baseline {base['pages_per_calibration']} ({result['pages_per_second']} pages/s here)")
+        max_memory = base["peak_memory_bytes"] * (1 + tolerance)
+        if result["peak_memory_bytes"] > max_memory:
+            failures.append(f"{name}: peak memory {result['peak_memory_bytes']} B, baseline {base['peak_memory_bytes']} B")
+    return failures
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PO parser on synthetic PDFs")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="skip the large scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the fastest is kept")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="exit 1 if throughput or peak memory regressed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--low-memory", action="store_true", help="run with PDF_LOW_MEMORY behaviour")
+    args = parser.parse_args(argv)
+    pdftext.LOW_MEMORY = args.low_memory or pdftext.LOW_MEMORY
+
+    names = args.scenario or (QUICK_SCENARIOS if args.quick else tuple(SCENARIOS))
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "low_memory": pdftext.LOW_MEMORY,
+        "scenarios": {},
+    }
+    for name in names:
+        result = run_scenario(name, args.repeat)
+        results["scenarios"][name] = result
+        print(f"⏱️ {name}: {result['pages']} pages in {result['total_seconds']:.3f}s "
+              f"({result['pages_per_second']} pages/s, peak {result['peak_memory_bytes'] / 1e6:.1f} MB)", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}", file=sys.stderr)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline updated: {args.baseline}", file=sys.stderr)
+
+    if args.check:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"❌ Regression: {failure}", file=sys.stderr)
+        if failures:
+            return 1
+        print("✅ No regressions against the baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
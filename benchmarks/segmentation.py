@@ -0,0 +1,126 @@
+# Segmentation scaling check: block splitting and the item INFO scan on pathological text (very
+# long sections, thousands of items, malformed markers, labels that never end) must stay near
+# linear, and on normal POs must give exactly what the original regexes gave.
+#   python benchmarks/segmentation.py             # exit 1 on super-linear growth or a mismatch
+import io
+import os
+import re
+import sys
+import math
+import time
+import argparse
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from synthetic import build_po_pdf  # noqa: E402
+import main  # noqa: E402
+import segments  # noqa: E402
+from pdftext import PdfDocument  # noqa: E402
+
+# The patterns segments.py replaced; the reference for identical output
+REFERENCE = {
+    "item_blocks": lambda text: re.findall(
+        r'(^\d+\).*?)(?=^\d+\)|^Suomen Osuuskauppojen Keskuskunta|\Z)', text, re.MULTILINE | re.DOTALL),
+    "product_blocks": lambda text: re.findall(
+        r'(^\d+\).*?)(?=\n\d+\)|^\d+\)|^ARTICLE GENERAL INFORMATION|\Z)', text, re.MULTILINE | re.DOTALL),
+    "general_info_sections": lambda text: re.findall(
+        r'(ARTICLE GENERAL INFORMATION.*?)(?=ARTICLE GENERAL INFORMATION|\Z)', text, re.DOTALL | re.IGNORECASE),
+    "info_value": lambda block: (lambda m: m.group(1) if m else None)(re.search(
+        r'(?<!PREHANDLING\s)(?<!PARCEL LABEL CODE\s)INFO:\s*(.*?)(?=\s+[A-Z ]+:\s*|$)', block, re.DOTALL | re.IGNORECASE)),
+}
+
+LINE = "SOME LONG LINE OF TEXT 12345 WITHOUT ANY MARKER\n"
+
+# name: (segments function, text of size n)
+CASES = {
+    "long_section": ("product_blocks", lambda n: "ARTICLE GENERAL INFORMATION\n1) ITEM\n" + LINE * n),
+    "long_page_text": ("item_blocks", lambda n: "1) ITEM\n" + LINE * n + "Suomen Osuuskauppojen Keskuskunta\n"),
+    "thousands_of_items": ("item_blocks", lambda n: "".join(f"{i}) ITEM {i}\nEAN CODE: 1234567890123\n" for i in range(n))),
+    "malformed_markers": ("product_blocks", lambda n: "1) ITEM\n" + ("9" * 40 + " PCS\n(2 ITEM\n3 )\n") * n),
+    "headings_in_any_case": ("general_info_sections", lambda n: "Article General Information\nx\n" * n),
+    "info_without_label_end": ("info_value", lambda n: "1) ITEM\nINFO: " + "WORD " * n),
+    "info_with_blank_runs": ("info_value", lambda n: "1) ITEM\nINFO: x" + " \t \n WORD" * n + " -"),
+}
+
+# Sizes are multiplied by SCALE once; time may grow by at most SCALE ** MAX_EXPONENT
+BASE_SIZE = 5000
+SCALE = 8
+MAX_EXPONENT = 1.3
+
+
+def _best_time(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling(base_size, repeat):
+    # {case: growth exponent of the time between base_size and SCALE * base_size}
+    results = {}
+    for name, (function, build) in CASES.items():
+        fn = getattr(segments, function)
+        small, large = build(base_size), build(base_size * SCALE)
+        seconds = _best_time(fn, small, repeat), _best_time(fn, large, repeat)
+        results[name] = {
+            "seconds": [round(s, 6) for s in seconds],
+            "exponent": round(math.log(max(seconds[1], 1e-9) / max(seconds[0], 1e-9)) / math.log(SCALE), 3),
+        }
+    return results
+
+
+def normal_inputs():
+    # (function, input) pairs from the text of synthetic POs of both layouts, as the parsers see it
+    for options in (dict(items=40, min_pages=6), dict(items=300, with_heading=True, sections=6, pre_items=3)):
+        with redirect_stdout(io.StringIO()), PdfDocument(build_po_pdf(**options), workers=0) as doc:
+            if options.get("with_heading"):
+                text = "".join(main.iter_page_chunks(doc))
+            else:
+                text = "".join(doc.page_text(n, x_tolerance=2) + "\n" for n in range(2, min(6, len(doc))))
+        yield "item_blocks", text
+        for block in segments.item_blocks(text):
+            yield "info_value", block
+        yield "general_info_sections", text
+        for section in segments.general_info_sections(text):
+            yield "product_blocks", section
+
+
+def mismatches():
+    # Inputs where segments.py and the reference patterns disagree (normal POs and small pathological cases)
+    inputs = list(normal_inputs())
+    inputs.extend((function, build(200)) for function, build in CASES.values())
+    return [(function, text[:80]) for function, text in inputs if getattr(segments, function)(text) != REFERENCE[function](text)]
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Check that block segmentation scales linearly")
+    parser.add_argument("--size", type=int, default=BASE_SIZE, help="smaller input size (lines, items or words)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is kept")
+    parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for function, text in mismatches():
+        print(f"❌ {function} differs from the original pattern on {text!r}...", file=sys.stderr)
+        failed = True
+
+    for name, result in scaling(args.size, args.repeat).items():
+        ok = result["exponent"] <= args.max_exponent
+        failed |= not ok
+        small, large = result["seconds"]
+        print(f"{'⏱️' if ok else '❌'} {name}: {small * 1000:.2f} ms -> {large * 1000:.2f} ms for {SCALE}x the input "
+              f"(exponent {result['exponent']})", file=sys.stderr)
+
+    if failed:
+        return 1
+    print("✅ Segmentation is linear and matches the original patterns", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,203 @@
+import random
+
+# Deterministic generator for SOK-style purchase-order PDFs.
+# Writes a minimal PDF by hand (Helvetica, WinAnsi) so it needs no extra deps.
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+LINE_HEIGHT = 13
+FONT_SIZE = 9
+TOP = 800
+BOTTOM = 60
+LINES_PER_PAGE = (TOP - BOTTOM) // LINE_HEIGHT
+
+ARTICLES = ["UMBRELLA AUTO OPEN", "RAIN JACKET ADULT", "WIND JACKET ANTI WIND", "BEACH HOUSE TOWEL", "KIDS UMBRELLA AUTO-OPEN"]
+COLOURS = ["18-2043TCX RASPBERRY", "18-3840TCX PURPLE", "19-4052TCX CLASSIC BLUE", "11-0601TCX BRIGHT WHITE"]
+SIZES = ["ONE SIZE", "S", "M", "L", "XL", "110-116"]
+BRANDS = ["HOUSE", "RAINY", "NORDICA"]
+COUNTRIES = ["CN", "VN", "BD"]
+FOOTER = "Suomen Osuuskauppojen Keskuskunta, Fleminginkatu 34, 00510 Helsinki"
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _header_lines(rng, order_no, total_pages):
+    # Two-column header: (left text, right text) per line
+    return [
+        ("SOK Consumer Goods", "PURCHASE ORDER"),
+        ("Fleminginkatu 34", f"NO: {order_no} Page 1 ({total_pages})"),
+        ("00510 Helsinki", "12.03.2024"),
+        ("", ""),
+        ("SUPPLIER:", ""),
+        (f"SUPPLIER COMPANY {rng.randint(1, 99)} LTD", ""),
+        ("Industrial Road 1, Shanghai", ""),
+        ("CONTACT PERSON: Wei Zhang", ""),
+        ("TIME OF DELIVERY: 15.05.2024", ""),
+        ("TERMS OF DELIVERY: FOB", ""),
+        ("Shanghai port", ""),
+        ("TRANSPORT BY: SEA", ""),
+        ("LOADING PLACE: SHANGHAI", ""),
+        ("DESTINATION: VANTAA", ""),
+        ("TERMS OF PAYMENT: 60 DAYS NET", ""),
+        ("", ""),
+        ("ORDER CONFIRMATION: REQUIRED", ""),
+        ("DELIVERY CONFIRMATION: REQUIRED", ""),
+        ("VALUE OF ORDER", ""),
+        (f"{rng.randint(1000, 99999)},00 USD", ""),
+        ("SUPPLY PLANNER", ""),
+        ("Anna Virtanen", ""),
+        ("V12", ""),
+    ]
+
+
+def _item_lines(rng, number, with_heading):
+    article = rng.choice(ARTICLES)
+    qty = rng.randint(1, 40) * 6
+    price = f"{rng.randint(1, 60)},{rng.randint(0, 99):02d}"
+    ean = "64" + "".join(str(rng.randint(0, 9)) for _ in range(11))
+    art_no = "".join(str(rng.randint(0, 9)) for _ in range(8))
+    colour = rng.choice(COLOURS)
+    size = rng.choice(SIZES)
+    if with_heading:
+        style = "".join(rng.choice("ABCDEFGH0123456789") for _ in range(9))
+        supp = f"206H{rng.randint(100000, 999999)}"
+        return [
+            f"{number}) {article} {style} {qty} PC {price} USD",
+            f"{ean} {art_no} {supp}",
+            f"COLOUR: {colour} SIZE: {size}",
+            f"SALES LOT SL: {rng.choice([6, 12])} PC",
+        ]
+    style = "KT" + "".join(rng.choice("0123456789") for _ in range(8))
+    return [
+        f"{number}) {article} STYLE: {style} {qty} PC {price} USD",
+        f"{ean} {art_no} KTAW-{rng.randint(100, 999)}",
+        f"COLOUR: {colour} SIZE: {size} SALES LOT SL: {rng.choice([6, 12])} PC",
+        f"BRAND: {rng.choice(BRANDS)} COUNTRY OF ORIGIN: {rng.choice(COUNTRIES)} CUSTOMS TARIFF NUMBER: 66019100",
+        f"INFO: Packed {rng.choice(['individually', 'in pairs'])} Style: {style}",
+        "PREHANDLING INFO: PREHANDLING INCLUDED",
+        f"PARCEL LABEL CODE: PL{rng.randint(1000, 9999)}",
+    ]
+
+
+def _general_info_lines(rng, total, with_style=True):
+    style = "".join(rng.choice("ABCDEFGH0123456789") for _ in range(9))
+    lines = [
+        "ARTICLE GENERAL INFORMATION",
+        *([f"STYLE: {style}"] if with_style else []),
+        f"BRAND: {rng.choice(BRANDS)} COUNTRY OF ORIGIN: {rng.choice(COUNTRIES)}",
+        "CUSTOMS TARIFF NUMBER: 62019300",
+        "PREHANDLING INFO: PREHANDLING INCLUDED",
+        f"PARCEL LABEL CODE: PL{rng.randint(1000, 9999)}",
+    ]
+    if total:
+        lines.append(f"Total quantity of articles: {total} PC")
+    return lines
+
+
+def _body_lines(rng, items, with_heading, sections, total_section=0, pre_items=0, general_style=True):
+    lines = []
+    for number in range(1, pre_items + 1):
+        lines.extend(_item_lines(rng, number, False))
+    if with_heading:
+        per_section = max(1, -(-items // sections))
+        number = 1
+        for s in range(sections):
+            lines.extend(_general_info_lines(rng, rng.randint(100, 900) if s == total_section else None, general_style))
+            for _ in range(min(per_section, items - number + 1)):
+                lines.extend(_item_lines(rng, number, True))
+                number += 1
+    else:
+        for number in range(1, items + 1):
+            lines.extend(_item_lines(rng, number, False))
+    return lines
+
+
+def build_po_lines(items=10, with_heading=False, sections=1, seed=0, min_pages=1, total_section=0, pre_items=0,
+                   general_style=True):
+    # Returns a list of pages, each a list of (x, y, text) tuples.
+    # general_style=False leaves STYLE out of every general-info block (the items then carry their own).
+    rng = random.Random(seed)
+    order_no = str(100000 + rng.randint(0, 899999))
+    body = _body_lines(rng, items, with_heading, sections, total_section, pre_items, general_style)
+    # Partone only reads pages 3-6, so items start on page 3 for that layout
+    filler_pages = 1
+    chunks = []
+    per_page = LINES_PER_PAGE - 2
+    for start in range(0, len(body), per_page):
+        chunks.append(body[start:start + per_page])
+    total_pages = max(min_pages, 1 + filler_pages + len(chunks))
+    header = _header_lines(rng, order_no, total_pages)
+
+    pages = []
+    first = []
+    y = TOP
+    for left, right in header:
+        if left:
+            first.append((50, y, left))
+        if right:
+            first.append((380, y, right))
+        y -= LINE_HEIGHT
+    pages.append(first)
+    pages.append([(50, TOP, "Delivery instructions"), (50, TOP - LINE_HEIGHT, "Labels must follow SOK packaging guide.")])
+    for chunk in chunks:
+        page = []
+        y = TOP
+        for line in chunk:
+            page.append((50, y, line))
+            y -= LINE_HEIGHT
+        pages.append(page)
+    while len(pages) < total_pages:
+        pages.append([(50, TOP, "Notes")])
+    for number, page in enumerate(pages, 1):
+        page.append((50, BOTTOM - 20, FOOTER))
+        page.append((450, BOTTOM - 20, f"Page {number} ({len(pages)})"))
+    return pages
+
+
+def build_po_pdf(items=10, with_heading=False, sections=1, seed=0, min_pages=1, total_section=0, pre_items=0,
+                 general_style=True):
+    pages = build_po_lines(items, with_heading, sections, seed, min_pages, total_section, pre_items, general_style)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_obj = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for page in pages:
+        ops = []
+        for x, y, text in page:
+            ops.append(f"BT /F1 {FONT_SIZE} Tf {x} {y} Td ({_escape(text)}) Tj ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {content} 0 R >>".encode()
+        ))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode()
+    objects[pages_obj - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+if __name__ == "__main__":
+    import sys
+    with open(sys.argv[1] if len(sys.argv) > 1 else "synthetic.pdf", "wb") as f:
+        f.write(build_po_pdf(items=12, with_heading="--heading" in sys.argv))
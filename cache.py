@@ -0,0 +1,186 @@
+import os
+import re
+import shutil
+import hashlib
+import threading
+import formats
+from collections import OrderedDict
+from functools import lru_cache
+
+# Bump when parser output changes in a way the source fingerprint can't see (e.g. a dependency upgrade)
+PARSER_VERSION = "1"
+PARSER_MODULES = ("main.py", "master.py", "partone.py", "parttwo.py", "pdftext.py", "fields.py", "ocr.py", "records.py", "templates.py", "segments.py")
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("PDF_RESULT_CACHE_MAX_ENTRIES", 256))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("PDF_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Optional on-disk tier that survives restarts; disabled unless a directory is given
+RESULT_CACHE_DIR = os.environ.get("PDF_RESULT_CACHE_DIR")
+
+
+@lru_cache(maxsize=1)
+def parser_fingerprint():
+    # Version string, text settings and the parser sources, so editing a rule invalidates old entries
+    h = hashlib.sha256(PARSER_VERSION.encode())
+    h.update(os.environ.get("PDF_TEXT_ENGINE", "pdfplumber").encode())
+    h.update(os.environ.get("PDF_LAYOUT_PROBE", "text").encode())
+    for name, default in (("PDF_OCR", "1"), ("PDF_OCR_DPI", "300"), ("PDF_OCR_LANG", "eng")):
+        h.update(os.environ.get(name, default).encode())
+    # Header templates change the output too, so their file is part of the fingerprint
+    templates_path = os.environ.get("PDF_HEADER_TEMPLATES")
+    if templates_path and os.path.exists(templates_path):
+        with open(templates_path, "rb") as f:
+            h.update(f.read())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in PARSER_MODULES:
+        path = os.path.join(base, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+# What parser_fingerprint() names its directories
+FINGERPRINT_NAME = re.compile(r'[0-9a-f]{16}')
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """Parse results keyed by SHA-256 of the PDF bytes, with an LRU memory tier and optional disk tier.
+
+    Cached results are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 directory=RESULT_CACHE_DIR, fingerprint=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.fingerprint = fingerprint or parser_fingerprint()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "stores": 0}
+        if directory:
+            os.makedirs(self._disk_dir(), exist_ok=True)
+
+    def _disk_dir(self):
+        return os.path.join(self.directory, self.fingerprint)
+
+    def _disk_path(self, digest):
+        return os.path.join(self._disk_dir(), digest + ".json")
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return entry[0]
+
+        if self.directory:
+            try:
+                with open(self._disk_path(digest), "rb") as f:
+                    payload = f.read()
+            except OSError:
+                payload = None
+            if payload is not None:
+                result = formats.decode_json(payload)
+                with self._lock:
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    self._remember(digest, result, len(payload))
+                return result
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, digest, result):
+        payload = formats.encode_json(result)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._remember(digest, result, len(payload))
+        if self.directory:
+            path = self._disk_path(digest)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+    def _remember(self, digest, result, size):
+        if size > self.max_bytes:
+            return
+        if digest in self._entries:
+            self._bytes -= self._entries.pop(digest)[1]
+        self._entries[digest] = (result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.counters["evictions"] += 1
+
+    def invalidate(self, digest=None):
+        # One entry by digest, or everything (memory and disk) when no digest is given
+        with self._lock:
+            if digest is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(digest, None)
+                removed = 1 if entry else 0
+                if entry:
+                    self._bytes -= entry[1]
+        if self.directory:
+            if digest is None:
+                # Only this cache's own entries: the directory itself is the operator's
+                on_disk = 0
+                for name in os.listdir(self._disk_dir()):
+                    if name.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(self._disk_dir(), name))
+                            on_disk += 1
+                        except OSError:
+                            pass
+                removed = max(removed, on_disk)
+            else:
+                try:
+                    os.remove(self._disk_path(digest))
+                    removed = max(removed, 1)
+                except OSError:
+                    pass
+        return removed
+
+    def purge_stale(self):
+        # Drop on-disk entries written by other parser versions
+        if not self.directory:
+            return 0
+        removed = 0
+        for name in os.listdir(self.directory):
+            # Other parser versions' directories only; anything else in there is left alone
+            if name != self.fingerprint and FINGERPRINT_NAME.fullmatch(name):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._bytes,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes,
+                        disk=bool(self.directory), fingerprint=self.fingerprint)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,213 @@
+# Batch CLI for backfills: parse many POs across worker processes into one NDJSON file.
+#   python cli.py archive/ "incoming/**/*.pdf" -o results.ndjson --workers 8
+# Each finished document appends {"file", "records"} to the output and its path to the
+# checkpoint file; running the same command again skips everything already checkpointed.
+# Failures go to stderr and to <output>.failures.ndjson without stopping the run.
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+from contextlib import redirect_stdout
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import formats
+import warmup
+
+# Submitted but unfinished documents per worker, so huge runs don't queue everything up front
+IN_FLIGHT_PER_WORKER = 4
+
+
+def find_pdfs(inputs, recursive=False):
+    # Files, directories (their *.pdf, optionally recursive) and glob patterns, deduplicated in input order
+    found = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.pdf") if recursive else os.path.join(item, "*.pdf")
+            paths = sorted(glob.glob(pattern, recursive=recursive))
+        elif glob.has_magic(item):
+            paths = sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        else:
+            paths = [item]
+        for path in paths:
+            found.setdefault(os.path.abspath(path), None)
+    return list(found)
+
+
+def read_checkpoint(path):
+    # {file: status} of documents already handled by earlier runs
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                status, _, name = line.rstrip("\n").partition("\t")
+                if name:
+                    done[name] = status
+    return done
+
+
+def parse_file(path):
+    # Runs in a worker: (path, encoded NDJSON line or None, error or None, seconds)
+    import main
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()):
+            result = main.parse_combined_records(path, workers=0)
+        if not result:
+            return path, None, "No valid data extracted", time.perf_counter() - start
+        return path, formats.encode_json({"file": path, "records": result}) + b"\n", None, time.perf_counter() - start
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+def _clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    def __init__(self, total, interval):
+        self.total = total
+        self.interval = interval
+        self.done = self.failed = 0
+        self.start = self._last = time.perf_counter()
+
+    def update(self, failed):
+        self.done += 1
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = _clock((self.total - self.done) / rate) if rate else "?"
+        print(f"📊 {self.done}/{self.total} documents, {rate:.2f} docs/s, {self.failed} failed, "
+              f"elapsed {_clock(elapsed)}, ETA {eta}", file=sys.stderr, flush=True)
+
+
+def run(paths, output, checkpoint, failures, workers, progress_interval=5.0):
+    # Parse paths not yet in the checkpoint; returns the number of failures in this run
+    progress = Progress(len(paths), progress_interval)
+    with open(output, "ab") as out, open(checkpoint, "a", encoding="utf-8") as ckpt, \
+            open(failures, "ab") as failed_log:
+
+        def record(path, line, error, seconds):
+            if error is None:
+                out.write(line)
+                out.flush()
+            else:
+                print(f"❌ {path}: {error}", file=sys.stderr, flush=True)
+                failed_log.write(formats.encode_json({"file": path, "error": error, "seconds": round(seconds, 3)}) + b"\n")
+                failed_log.flush()
+            # Checkpoint only after the output line is written: a crash in between repeats the
+            # document on resume rather than losing it
+            ckpt.write(f"{'ok' if error is None else 'failed'}\t{path}\n")
+            ckpt.flush()
+            progress.update(error is not None)
+
+        if workers <= 0:
+            for path in paths:
+                record(*parse_file(path))
+            return progress.failed
+
+        # A worker that dies (e.g. OOM-killed on one PDF) breaks the whole pool, failing every
+        # document in flight on it. Those go back to a fresh pool as suspects, each run alone, so
+        # only a document that kills its worker by itself is recorded as failed.
+        todo, suspects = deque(paths), deque()
+        pool, pending = None, {}
+        try:
+            while todo or suspects or pending:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=workers, initializer=warmup.warm_worker)
+                broken = False
+                while True:
+                    if suspects:
+                        queue = suspects if not pending else None
+                    else:
+                        queue = todo if len(pending) < workers * IN_FLIGHT_PER_WORKER else None
+                    if not queue:
+                        break
+                    try:
+                        future = pool.submit(parse_file, queue[0])
+                    except BrokenProcessPool:
+                        broken = True
+                        break
+                    pending[future] = queue.popleft()
+                if pending and not broken:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    broken = any(isinstance(future.exception(), BrokenProcessPool) for future in finished)
+                    if not broken:
+                        for future in finished:
+                            pending.pop(future)
+                            record(*future.result())
+                if broken:
+                    # Every future of a broken pool completes; keep the results that made it
+                    wait(pending)
+                    lost = []
+                    for future, path in pending.items():
+                        if isinstance(future.exception(), BrokenProcessPool):
+                            lost.append(path)
+                        else:
+                            record(*future.result())
+                    pending.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+                    print(f"⚠️ Worker pool broke, continuing on a new one ({len(lost)} document(s) in flight)",
+                          file=sys.stderr, flush=True)
+                    if len(lost) == 1:
+                        record(lost[0], None, "Worker process died while parsing this document", 0.0)
+                    else:
+                        suspects.extend(lost)
+        except BaseException:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        if pool is not None:
+            pool.shutdown()
+    return progress.failed
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Parse purchase-order PDFs in bulk into NDJSON (one line per document)")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns (quote them)")
+    parser.add_argument("-o", "--output", default="results.ndjson", help="NDJSON file to append to")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also look in subdirectories of directory inputs")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (0 = in this process)")
+    parser.add_argument("--checkpoint", help="progress file (default: <output>.checkpoint)")
+    parser.add_argument("--failures", help="failed documents as NDJSON (default: <output>.failures.ndjson)")
+    parser.add_argument("--retry-failed", action="store_true", help="parse documents that failed in earlier runs again")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    checkpoint = args.checkpoint or args.output + ".checkpoint"
+    failures = args.failures or args.output + ".failures.ndjson"
+
+    paths = find_pdfs(args.inputs, args.recursive)
+    done = read_checkpoint(checkpoint)
+    skip = {path for path, status in done.items() if status == "ok" or not args.retry_failed}
+    todo = [path for path in paths if path not in skip]
+    where = f"on {args.workers} worker process(es)" if args.workers > 0 else "in this process"
+    print(f"📂 {len(paths)} PDF(s) found, {len(paths) - len(todo)} already done, {len(todo)} to parse {where}",
+          file=sys.stderr)
+    if not todo:
+        return 0
+
+    try:
+        failed = run(todo, args.output, checkpoint, failures, args.workers, args.progress_interval)
+    except KeyboardInterrupt:
+        print(f"⏸️ Interrupted — run the same command again to resume (checkpoint: {checkpoint})", file=sys.stderr)
+        return 130
+
+    print(f"✅ {len(todo) - failed} document(s) written to {args.output}"
+          + (f", {failed} failed (see {failures})" if failed else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
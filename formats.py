@@ -0,0 +1,149 @@
+import io
+import csv
+import json
+from records import to_dict, json_default, is_item
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack output is only offered when the package is installed
+    msgpack = None
+
+MASTER_KEY = "MASTER METADATA"
+GENERAL_INFO_KEY = "ARTICLE GENERAL INFORMATION"
+TOTAL_KEY = "Total quantity of articles"
+
+# format name: media type. json is the default everywhere.
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/msgpack",
+    "csv": "text/csv",
+}
+ACCEPT_ALIASES = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "text/csv": "csv",
+}
+# "records" is the list parse_combined_pdf returns; "flat" stores each general-info block once
+LAYOUTS = ("records", "flat")
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def encode_json(obj):
+    # Compact UTF-8 JSON bytes
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def decode_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def negotiate(fmt=None, accept=None, default="json"):
+    # An explicit ?format= wins, then the first Accept media type we can produce
+    if fmt:
+        if fmt not in MEDIA_TYPES:
+            raise UnsupportedFormat(f"Unknown format {fmt!r}, expected one of {tuple(MEDIA_TYPES)}")
+        name = fmt
+    else:
+        name = default
+        for part in (accept or "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in ACCEPT_ALIASES:
+                name = ACCEPT_ALIASES[media_type]
+                break
+    if name == "msgpack" and msgpack is None:
+        raise UnsupportedFormat("msgpack output needs the msgpack package")
+    return name
+
+
+def _copies_general_info(item, general_info):
+    # Product items start with a copy of their section's general info (same keys, same order)
+    keys = list(general_info)
+    return bool(keys) and list(item)[:len(keys)] == keys
+
+
+def flatten(records):
+    # {"master", "totals", "general_info": [{"id", ...}], "items": [{"general_info_id", own fields}]}.
+    # An item keeps only the fields that differ from its general info; {**general_info, **item}
+    # (without general_info_id) gives the original record back.
+    doc = {"master": None, "totals": [], "general_info": [], "items": []}
+    general_info, general_info_id = None, None
+    for record in records:
+        record = to_dict(record)
+        if len(record) == 1 and MASTER_KEY in record:
+            doc["master"] = record[MASTER_KEY]
+        elif len(record) == 1 and TOTAL_KEY in record:
+            doc["totals"].append(record[TOTAL_KEY])
+        elif len(record) == 1 and GENERAL_INFO_KEY in record:
+            general_info = record[GENERAL_INFO_KEY]
+            general_info_id = len(doc["general_info"])
+            doc["general_info"].append({"id": general_info_id, **general_info})
+        elif general_info is not None and _copies_general_info(record, general_info):
+            own = {k: v for k, v in record.items() if k not in general_info or general_info[k] != v}
+            doc["items"].append({"general_info_id": general_info_id, **own})
+        else:
+            doc["items"].append({"general_info_id": None, **record})
+    return doc
+
+
+def _ndjson_lines(records, layout):
+    if layout == "records":
+        for record in records:
+            yield encode_json(record) + b"\n"
+        return
+    doc = flatten(records)
+    if doc["master"] is not None:
+        yield encode_json({"type": "master", **doc["master"]}) + b"\n"
+    for total in doc["totals"]:
+        yield encode_json({"type": "total", TOTAL_KEY: total}) + b"\n"
+    for general_info in doc["general_info"]:
+        yield encode_json({"type": "general_info", **general_info}) + b"\n"
+    for item in doc["items"]:
+        yield encode_json({"type": "item", **item}) + b"\n"
+
+
+def items_csv(records):
+    # One row per line item with every field it has, its general info included (a CSV has no
+    # second table to point into), columns in first-seen order
+    items = [record for record in map(to_dict, records) if is_item(record)]
+    columns = list(dict.fromkeys(key for item in items for key in item))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, restval="", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(items)
+    return out.getvalue().encode("utf-8")
+
+
+def render(records, fmt="json", layout="records"):
+    # Encoded body for the given format; csv is always the item table, whatever the layout
+    if layout not in LAYOUTS:
+        raise UnsupportedFormat(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    if fmt == "csv":
+        return items_csv(records)
+    if fmt == "ndjson":
+        return b"".join(_ndjson_lines(records, layout))
+    payload = flatten(records) if layout == "flat" else records
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise UnsupportedFormat("msgpack output needs the msgpack package")
+        return msgpack.packb(payload, use_bin_type=True, default=json_default)
+    if fmt == "json":
+        return encode_json(payload)
+    raise UnsupportedFormat(f"Unknown format {fmt!r}, expected one of {tuple(MEDIA_TYPES)}")
@@ -0,0 +1,171 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+import warmup
+
+# Number of worker processes parsing PDFs for the job API
+JOB_WORKERS = int(os.environ.get("PDF_JOB_WORKERS", os.cpu_count() or 1))
+# How long finished jobs are kept around for GET /jobs/{id}
+JOB_RETENTION_SECONDS = int(os.environ.get("PDF_JOB_RETENTION_SECONDS", 3600))
+
+
+def run_parser(source):
+    # Runs inside a worker process, so the parser modules are imported there.
+    # The job pool already spreads documents across cores, so pages are extracted serially here.
+    # source is a file path or the PDF bytes.
+    import main
+    return main.parse_combined_records(source, workers=0)
+
+
+def run_parser_with_metrics(source):
+    # run_parser plus the metrics recorded while parsing, which the API process merges into its own
+    metrics.REGISTRY.reset()
+    result = run_parser(source)
+    return result, metrics.REGISTRY.snapshot()
+
+
+class LocalJobQueue:
+    """In-process job queue backed by a pool of worker processes."""
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION_SECONDS):
+        self.workers = max(1, workers)
+        self.retention = retention
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warmup.warm_worker)
+            return self._executor
+
+    def _discard(self, executor):
+        # A worker died (OOM kill, a crash in a native library): the pool is unusable for good, so the
+        # next submit starts a new one. The jobs that were on it have already failed with BrokenProcessPool.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        print("⚠️ Job pool broke, starting a new one")
+        executor.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        executor = self.executor
+        try:
+            worker = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self.executor
+            worker = executor.submit(fn, *args)
+
+        def _check(_):
+            if not worker.cancelled() and isinstance(worker.exception(), BrokenProcessPool):
+                self._discard(executor)
+
+        worker.add_done_callback(_check)
+        return worker
+
+    def warm(self):
+        # Start every worker process now rather than on the first jobs; each warms itself up on start
+        futures = [self._submit(warmup.ping) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def _unwrap(self, worker):
+        # Future of the records alone; the worker's metrics are merged here when it finishes
+        future = Future()
+
+        def _done(_):
+            if worker.exception():
+                future.set_exception(worker.exception())
+                return
+            result, snapshot = worker.result()
+            metrics.REGISTRY.merge(snapshot)
+            future.set_result(result)
+
+        worker.add_done_callback(_done)
+        return future
+
+    def run(self, source):
+        # Parse on the pool without registering a job (used by the batch endpoint)
+        return self._unwrap(self._submit(run_parser_with_metrics, source))
+
+    def submit(self, source, job_id=None, on_result=None):
+        job_id = job_id or uuid.uuid4().hex
+        self._prune()
+        worker = self._submit(run_parser_with_metrics, source)
+        job = self._add(job_id, self._unwrap(worker), worker)
+        future = job["future"]
+
+        def _done(_):
+            job["finished"] = time.time()
+            if on_result is not None and not future.exception():
+                on_result(future.result())
+
+        future.add_done_callback(_done)
+        return job_id
+
+    def complete(self, result, job_id=None):
+        # Register a job whose result is already known (e.g. a result-cache hit)
+        job_id = job_id or uuid.uuid4().hex
+        self._prune()
+        future = Future()
+        future.set_result(result)
+        job = self._add(job_id, future)
+        job["finished"] = job["created"]
+        return job_id
+
+    def _add(self, job_id, future, worker=None):
+        job = {"id": job_id, "future": future, "worker": worker or future, "created": time.time(), "finished": None}
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [k for k, job in self._jobs.items() if job["finished"] and job["finished"] < cutoff]
+            for k in expired:
+                del self._jobs[k]
+
+    def _status(self, job):
+        future = job["future"]
+        if future.done():
+            return "failed" if future.exception() else "done"
+        return "running" if job["worker"].running() else "queued"
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        info = {"job_id": job_id, "status": self._status(job), "created": job["created"], "finished": job["finished"]}
+        if info["status"] == "failed":
+            info["error"] = str(job["future"].exception())
+        return info
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = LocalJobQueue()
+        return _queue
@@ -1,102 +1,148 @@
-import pdfplumber
 import re
 import json
-from partone import parse_pdf_without_heading, parse_block, extract_blocks
-from parttwo import parse_pdf_with_heading, extract_general_info_blocks, parse_general_info, extract_product_blocks, parse_product_block
+import time
+import itertools
+import metrics
+import formats
+import records
+from pdftext import open_document
+from partone import parse_pdf_without_heading, parse_blocks, extract_blocks
+from parttwo import ARTICLE_HEADING, iter_general_info_sections, iter_section_records
 from master import extract_master_metadata
 
 
-def has_article_general_info(pdf_path, max_pages_to_check=5):
+# Looser than ARTICLE_HEADING on purpose: a probe hit is confirmed on the fully extracted text
+HEADING_PROBE = re.compile(r'ARTICLE\s*GENERAL\s*INFORMATION', re.IGNORECASE)
+
+
+# ✅ Lazy, early-exit layout detection: first page that (probably) has the heading, or None
+def find_heading_page(doc, max_pages_to_check=None):
+    last_page = len(doc) if max_pages_to_check is None else min(len(doc), max_pages_to_check)
+    for page_num in range(last_page):
+        text = doc.probe_text(page_num)
+        if text and HEADING_PROBE.search(text):
+            return page_num
+    return None
+
+
+def has_article_general_info(source, max_pages_to_check=5):
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for i in range(min(len(pdf.pages), max_pages_to_check)):
-                text = pdf.pages[i].extract_text()
-                if text and "ARTICLE GENERAL INFORMATION" in text.upper():
-                    return True
+        with open_document(source) as doc:
+            return find_heading_page(doc, max_pages_to_check) is not None
     except Exception as e:
         print(f"❌ Error reading PDF: {e}")
     return False
 
 
-def parse_combined_pdf(pdf_path):
-    final_result = []
+# ✅ Page text as it is extracted, in the same "--- Page N ---" framing the parsers expect
+def iter_page_chunks(doc):
+    for page_num, text in doc.iter_page_text(range(len(doc)), x_tolerance=3):
+        if text:
+            yield f"\n--- Page {page_num + 1} ---\n{text}\n"
 
+
+# ✅ Generator pipeline: yields each record as soon as the section it belongs to is closed
+# reuse: parsed sections/blocks of a previous revision, see revisions.py
+def iter_combined_pdf(source, reuse=None, **options):
+    start = time.perf_counter()
+    pages = items = 0
+    produced = False
+    outcome = "ok"
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # ✅ 1. Extract master metadata first
-            master_data = extract_master_metadata(pdf)
-            if master_data:
-                final_result.append({"MASTER METADATA": master_data})
-                print("✅ Master metadata extracted and added.")
-
-            # ✅ 2. Read all text for layout decision
-            full_text = ""
-            for page_num in range(len(pdf.pages)):
-                page = pdf.pages[page_num]
-                text = page.extract_text(x_tolerance=3)
-                if text:
-                    full_text += f"\n--- Page {page_num + 1} ---\n{text}\n"
-
-            # ✅ 3. Check if 'ARTICLE GENERAL INFORMATION' is present
-            match = re.search(r'ARTICLE GENERAL INFORMATION', full_text, re.IGNORECASE)
-            if match:
-                before_text = full_text[:match.start()]
-                after_text = full_text[match.start():]
-
-                # ✅ 4. Handle Part One (before heading)
-                pre_blocks = extract_blocks(before_text)
-                print(f"🔎 Found {len(pre_blocks)} pre-heading item blocks")
-                for block in pre_blocks:
-                    result = parse_block(block)
-                    if result:
-                        final_result.append(result)
-
-                # ✅ 5. Handle Part Two (after heading)
-                general_sections = extract_general_info_blocks(after_text)
-                total_qty_match = re.search(r'Total\s*(?:quantity\s*)?of\s*articles\s*:\s*(\d+\s*PC)', after_text, re.IGNORECASE)
-                global_total = {"Total quantity of articles": total_qty_match.group(1).strip()} if total_qty_match else None
-
-                for i, section in enumerate(general_sections):
-                    general_info = parse_general_info(section)
-
-                    # If total quantity is embedded inside general_info, extract it separately
-                    if "Total quantity of articles" in general_info:
-                        final_result.append({"Total quantity of articles": general_info.pop("Total quantity of articles")})
-                    elif global_total and i == 0:
-                        final_result.append(global_total)
-
-                    if general_info:
-                        final_result.append({"ARTICLE GENERAL INFORMATION": general_info})
-
-                    product_blocks = extract_product_blocks(section)
-                    for block in product_blocks:
-                        item = parse_product_block(block, general_info)
-                        if item:
-                            final_result.append(item)
-
-            else:
-                print("📄 No 'ARTICLE GENERAL INFORMATION' found — using Part ONE parser")
-                parse_pdf_without_heading(pdf_path)
-                return  # partone already saves its output separately
+        # ✅ 0. Open the PDF once; every stage below shares its page-text cache
+        # (options: workers / min_parallel_pages for parallel extraction, engine for the text backend)
+        with open_document(source, **options) as doc:
+            pages = len(doc)
+            for record in iter_document_records(doc, reuse):
+                # Line items only, not the metadata / general-info / total wrappers
+                produced = True
+                items += records.is_item(record)
+                yield record
+            print(f"🔧 Text engines per page: {doc.engine_report()}")
 
     except Exception as e:
+        outcome = "error"
         print("❌ Error while processing PDF:", e)
 
-    # ✅ 6. Write all combined output
-    if final_result:
-        with open("combined.json", "w", encoding="utf-8") as f:
-            json.dump(final_result, f, indent=4, ensure_ascii=False)
-        print("✅ Saved full data to combined.json")
-    else:
+    metrics.observe_document(time.perf_counter() - start, pages, items, outcome if produced or outcome == "error" else "empty")
+
+
+def iter_document_records(doc, reuse=None):
+    # ✅ 0b. Scanned pages (no text layer) are OCR'd together up front instead of one by one
+    doc.prepare_ocr(range(len(doc)))
+
+    # ✅ 1. Extract master metadata first
+    with metrics.stage("master_metadata"):
+        master_data = extract_master_metadata(doc)
+
+    # ✅ 2. Decide the layout: a cheap probe stops at the first page with the heading, so the
+    # no-heading layout never pays for full extraction of pages Part ONE ignores
+    match = None
+    if find_heading_page(doc) is not None:
+        # Read pages (reusing anything already extracted) up to the heading
+        chunks = iter_page_chunks(doc)
+        before_text = ""
+        for chunk in chunks:
+            match = ARTICLE_HEADING.search(chunk)
+            if match:
+                before_text += chunk[:match.start()]
+                break
+            before_text += chunk
+
+    if match is None:
+        print("📄 No 'ARTICLE GENERAL INFORMATION' found — using Part ONE parser")
+        yield from parse_pdf_without_heading(doc, reuse)
+        return
+
+    if master_data:
+        yield {"MASTER METADATA": records.MasterMetadata(master_data)}
+        print("✅ Master metadata extracted and added.")
+
+    # ✅ 3. Handle Part One (before heading)
+    with metrics.stage("segmentation"):
+        pre_blocks = extract_blocks(before_text)
+    print(f"🔎 Found {len(pre_blocks)} pre-heading item blocks")
+    yield from parse_blocks(pre_blocks, reuse)
+
+    # ✅ 4. Handle Part Two (after heading), section by section as pages arrive
+    sections = iter_general_info_sections(itertools.chain([chunk[match.start():]], chunks))
+    yield from iter_section_records(sections, reuse=reuse)
+
+
+# ✅ Typed records (items share their section's general info); the API and job workers keep these
+def parse_combined_records(source, **options):
+    final_result = list(iter_combined_pdf(source, **options))
+    if not final_result:
         print("⚠️ No valid data extracted.")
 
+    return final_result
+
+
+def parse_combined_pdf(source, **options):
+    return [records.to_dict(record) for record in parse_combined_records(source, **options)]
+
+
+# ✅ Writing the result to disk is only done when asked for (CLI); compact unless an indent is given
+def save_json(result, output_path="combined.json", indent=None):
+    with metrics.stage("output"):
+        if indent is None:
+            with open(output_path, "wb") as f:
+                f.write(formats.encode_json(result))
+        else:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=indent, ensure_ascii=False, default=records.json_default)
+    print(f"✅ Saved full data to {output_path}")
+
 
 # ✅ This is the function your FastAPI `api.py` will call
-def run_from_api(pdf_path):
-    parse_combined_pdf(pdf_path)
+def run_from_api(source):
+    # source: a path, the PDF bytes or an open (spooled) file object
+    return parse_combined_records(source)
 
 
 # ✅ This block is for manual command-line testing
 if __name__ == "__main__":
     pdf_path = "PO_1.pdf"  # ⬅️ change this if testing manually
-    parse_combined_pdf(pdf_path)
+    result = parse_combined_pdf(pdf_path)
+    if result:
+        save_json(result)
@@ -1,136 +1,212 @@
-import pdfplumber
 import re
 import json
+from bisect import bisect_right
+from itertools import accumulate
+import templates
 
-def extract_master_metadata(pdf):
-    output = {}
-    def extract_text_lines(pdf, start_page=0, end_page=3):
+def extract_master_metadata(doc):
+    # Header fields from a coordinate template when one fits page 1 (only the template's
+    # regions are read), otherwise from the text lines of the first three pages
+    fields = templates.extract_header(doc)
+    if fields is not None:
+        return fields
+
+    def extract_text_lines(doc, start_page=0, end_page=3):
         text = ""
-        for page in pdf.pages[start_page:end_page]:
-            t = page.extract_text()
+        for page_num in range(start_page, min(end_page, len(doc))):
+            t = doc.page_text(page_num)
             if t:
                 text += t + "\n"
         return text
 
-    # Use the pdf object passed to the function directly
-    text = extract_text_lines(pdf)
+    # Use the shared document passed to the function, so page text is extracted only once
+    text = extract_text_lines(doc)
     lines = text.splitlines()
+    return resolve_header_fields(lines, index_header_lines(lines))
+
+
+HEADING_LINE = re.compile(r'^[A-Z][A-Z ]+:')
+ORDER_WORD = re.compile(r'\bORDER\b')
+NO_WORD = re.compile(r'\bNO\b')
+ORDER_NO = re.compile(r'\bNO[:\s]*([A-Z0-9/]+)', re.IGNORECASE)
+DATE = re.compile(r'\b(\d{1,2}\.\d{1,2}\.\d{2,4})\b')
+SOK_LINE_NOISE = re.compile(r'No:\s*\d+\s*Page\s*\d+\s*\(\d+\)|(\b\d{1,2}\.\d{1,2}\.\d{2,4}\b)')
+
+SOK_HEADER = "SOK Consumer Goods"
+KEYWORDS = ("SUPPLIER", "CONTACT PERSON", "ORDER CONFIRMATION", "DELIVERY CONFIRMATION", "VALUE OF ORDER", "SUPPLY PLANNER")
+DELIVERY_FIELDS = {
+    "TIME OF DELIVERY": "Time of Delivery",
+    "TERMS OF DELIVERY": "Delivery Terms",
+    "TRANSPORT BY": "Transport By",
+    "LOADING PLACE": "Loading Place",
+    "DESTINATION": "Destination",
+    "TERMS OF PAYMENT": "Terms of Payment",
+}
+
+
+# Lines containing a keyword (each listed once), from one str.find sweep over the joined text
+def _keyword_lines(text, starts, keyword):
+    found = []
+    pos = text.find(keyword)
+    while pos != -1:
+        line = bisect_right(starts, pos) - 1
+        found.append(line)
+        # Resume on the next line: one hit per line is all the index records
+        pos = text.find(keyword, starts[line + 1]) if line + 1 < len(starts) else -1
+    return found
+
+
+def _line_starts(lines):
+    return [0, *accumulate(len(line) + 1 for line in lines)][:len(lines)] if lines else []
+
+
+# Build the header index in one go: for each keyword the lines that carry it, found by sweeping
+# the joined text (so lines without any keyword cost nothing), plus lazily computed heading flags
+# ("NAME:") and, per line, the first heading/blank line at or after it.
+class HeaderIndex:
+    def __init__(self, lines):
+        self.lines = lines
+        self.n = len(lines)
+        self.upper = [line.upper() for line in lines]
+        upper_text = "\n".join(self.upper)
+        upper_starts = _line_starts(self.upper)
+        self.hits = {key: _keyword_lines(upper_text, upper_starts, key) for key in KEYWORDS + tuple(DELIVERY_FIELDS)}
+        self.hits["ORDER"] = [i for i in _keyword_lines(upper_text, upper_starts, "ORDER") if ORDER_WORD.search(self.upper[i])]
+        self.hits[SOK_HEADER] = _keyword_lines("\n".join(lines), _line_starts(lines), SOK_HEADER)
+        self._heading = {}
+        self._stop = {}
+
+    def heading(self, i):
+        if i not in self._heading:
+            self._heading[i] = HEADING_LINE.match(self.lines[i]) is not None
+        return self._heading[i]
+
+    def stop(self, i):
+        # First line >= i that is a heading or blank (n if none); every line of a run shares it
+        if i >= self.n:
+            return self.n
+        if i not in self._stop:
+            run = []
+            j = i
+            while j < self.n and j not in self._stop and not (self.heading(j) or not self.lines[j].strip()):
+                run.append(j)
+                j += 1
+            end = self._stop.get(j, j)
+            for k in run:
+                self._stop[k] = end
+            self._stop.setdefault(i, end)
+        return self._stop[i]
+
+
+def index_header_lines(lines):
+    return HeaderIndex(lines)
+
+
+def _value_after_colon(line):
+    return line.split(":")[-1].strip()
+
+
+def resolve_header_fields(lines, index):
+    output = {}
+    upper, heading, hits = index.upper, index.heading, index.hits
+    n = len(lines)
 
     # 1. ORDER NO + DATE (detect ORDER above, NO below, date further below)
-    for i, line in enumerate(lines):
-        if re.search(r'\bORDER\b', line.upper()):
-            if i + 1 < len(lines) and re.search(r'\bNO\b', lines[i + 1].upper()):
-                order_no_match = re.search(r'\bNO[:\s]*([A-Z0-9/]+)', lines[i + 1], re.IGNORECASE)
-                if order_no_match:
-                    output["Order No"] = order_no_match.group(1).strip()
-                if i + 2 < len(lines):
-                    date_match = re.search(r'\b(\d{1,2}\.\d{1,2}\.\d{2,4})\b', lines[i + 2])
-                    if date_match:
-                        output["Date"] = date_match.group(1)
-                break
+    for i in hits["ORDER"]:
+        if i + 1 < n and NO_WORD.search(upper[i + 1]):
+            order_no_match = ORDER_NO.search(lines[i + 1])
+            if order_no_match:
+                output["Order No"] = order_no_match.group(1).strip()
+            if i + 2 < n:
+                date_match = DATE.search(lines[i + 2])
+                if date_match:
+                    output["Date"] = date_match.group(1)
+            break
 
-    # 2. SOK Consumer Goods block (from page 1, capture multiple lines until next heading, exclude date)
+    # 2. SOK Consumer Goods block: from the first SOK line up to the next heading, skipping blanks
+    # and removing "No: 163513 Page 1 (6)" and dates
     sok_block = []
-    sok_found = False
-    for i, line in enumerate(lines):
-        if "SOK Consumer Goods" in line:
-            sok_found = True
-            # Remove "No: 163513 Page 1 (6)" and date pattern, add the base line
-            cleaned_line = re.sub(r'No:\s*\d+\s*Page\s*\d+\s*\(\d+\)|(\b\d{1,2}\.\d{1,2}\.\d{2,4}\b)', '', line).strip()
-            if cleaned_line:
-                sok_block.append(cleaned_line)
-        elif sok_found and line.strip():
-            # Continue capturing lines until a new heading or empty line, exclude date
-            if re.match(r'^[A-Z][A-Z ]+:', line) or not line.strip():
+    sok_lines = hits[SOK_HEADER]
+    if sok_lines:
+        sok_set = set(sok_lines)
+        for i in range(sok_lines[0], n):
+            line = lines[i]
+            if i in sok_set:
+                cleaned_line = SOK_LINE_NOISE.sub('', line).strip()
+            elif not line.strip():
+                continue
+            elif heading(i):
                 break
-            cleaned_line = re.sub(r'\b\d{1,2}\.\d{1,2}\.\d{2,4}\b', '', line).strip()
+            else:
+                cleaned_line = DATE.sub('', line).strip()
             if cleaned_line:
                 sok_block.append(cleaned_line)
-    if sok_found and sok_block:
+    if sok_block:
         output["SOK Consumer Goods"] = " ".join(sok_block)
     else:
         print("⚠️ No SOK block found on page 1.")
 
-    # 3. SUPPLIER block
-    supplier_block = ""
-    in_supplier = False
-    for line in lines:
-        if "SUPPLIER" in line.upper():
-            in_supplier = True
-        elif in_supplier and re.match(r'^[A-Z][A-Z ]+:', line):  # New heading
-            break
-        elif in_supplier:
-            supplier_block += line.strip() + " "
-    if supplier_block.strip():
-        output["Supplier"] = supplier_block.strip().replace("SUPPLIER:", "").strip()
+    # 3. SUPPLIER block: the lines after the first SUPPLIER line, up to the next heading
+    supplier_lines = hits["SUPPLIER"]
+    if supplier_lines:
+        supplier_set = set(supplier_lines)
+        supplier_block = ""
+        for i in range(supplier_lines[0] + 1, n):
+            if i in supplier_set:
+                continue
+            if heading(i):
+                break
+            supplier_block += lines[i].strip() + " "
+        if supplier_block.strip():
+            output["Supplier"] = supplier_block.strip().replace("SUPPLIER:", "").strip()
 
     # 4. Contact Person
-    for line in lines:
-        if "CONTACT PERSON" in line.upper():
-            val = line.split(":")[-1].strip()
-            if val:
-                output["Contact Person"] = val
-            break
+    if hits["CONTACT PERSON"]:
+        val = _value_after_colon(lines[hits["CONTACT PERSON"][0]])
+        if val:
+            output["Contact Person"] = val
 
-    # 5–10. Delivery info
-    fields = {
-        "TIME OF DELIVERY": "Time of Delivery",
-        "TERMS OF DELIVERY": "Delivery Terms",
-        "TRANSPORT BY": "Transport By",
-        "LOADING PLACE": "Loading Place",
-        "DESTINATION": "Destination",
-        "TERMS OF PAYMENT": "Terms of Payment",
-    }
-    for i, line in enumerate(lines):
-        for k, v in fields.items():
-            if k in line.upper():
-                payment_lines = []
-                payment_found = True
-                for j in range(i + 1, len(lines)):
-                    if re.match(r'^[A-Z][A-Z ]+:', lines[j]) or not lines[j].strip():
-                        break
-                    payment_lines.append(lines[j].strip())
-                val = line.split(":")[-1].strip()
-                if val or payment_lines:
-                    output[v] = " ".join([val] + payment_lines)
-
-    # 11–12. Order & Delivery Confirmation
-    for line in lines:
-        if "ORDER CONFIRMATION" in line.upper():
-            val = line.split(":")[-1].strip()
-            if val:
-                output["Order Confirmation"] = val
-        elif "DELIVERY CONFIRMATION" in line.upper():
-            val = line.split(":")[-1].strip()
-            if val:
-                output["Delivery Confirmation"] = val
-
-    # 13. Value of Order (can be 2 lines)
-    value_lines = []
-    for line in lines:
-        if "VALUE OF ORDER" in line.upper():
-            value_lines.append(line.strip())
-            continue
-        if value_lines and len(value_lines) < 2:
-            value_lines.append(line.strip())
-            break
-    if value_lines:
+    # 5–10. Delivery info: the value after the colon plus continuation lines up to the next
+    # heading/blank. Fields are added in the order their first usable line appears, and later
+    # lines overwrite earlier ones, so only the last usable line per field is joined.
+    usable = {}
+    for order, (key, field) in enumerate(DELIVERY_FIELDS.items()):
+        found = [i for i in hits[key] if _value_after_colon(lines[i]) or index.stop(i + 1) > i + 1]
+        if found:
+            usable[field] = (found[0], order, found[-1])
+    for field, (_, _, i) in sorted(usable.items(), key=lambda item: item[1][:2]):
+        payment_lines = [lines[j].strip() for j in range(i + 1, index.stop(i + 1))]
+        output[field] = " ".join([_value_after_colon(lines[i])] + payment_lines)
+
+    # 11–12. Order & Delivery Confirmation (last one wins, ORDER takes the line if both appear)
+    order_set = set(hits["ORDER CONFIRMATION"])
+    for i in sorted(order_set.union(hits["DELIVERY CONFIRMATION"])):
+        val = _value_after_colon(lines[i])
+        if val:
+            output["Order Confirmation" if i in order_set else "Delivery Confirmation"] = val
+
+    # 13. Value of Order (can be 2 lines): the heading plus the line below it, or, when the
+    # line below repeats the heading, every heading line
+    value_idx = hits["VALUE OF ORDER"]
+    if value_idx:
+        first = value_idx[0]
+        if first + 1 >= n:
+            value_lines = [lines[first].strip()]
+        elif "VALUE OF ORDER" not in upper[first + 1]:
+            value_lines = [lines[first].strip(), lines[first + 1].strip()]
+        else:
+            value_lines = [lines[i].strip() for i in value_idx]
         output["Value of Order"] = " ".join(value_lines)
 
     # 14. SUPPLY PLANNER block (until line contains a word starting with 'V' + digits)
-    planner_lines = []
-    in_planner = False
-    for line in lines:
-        if "SUPPLY PLANNER" in line.upper():
-            in_planner = True
-            planner_lines.append(line.strip())  # Include header
-        elif in_planner:
-            words = line.strip().split()
-            if any(word.startswith("V") and word[1:].isdigit() for word in words):
-                planner_lines.append(line.strip())  # Include Vxx line
+    planner_idx = hits["SUPPLY PLANNER"]
+    if planner_idx:
+        planner_set = set(planner_idx)
+        planner_lines = []
+        for i in range(planner_idx[0], n):
+            planner_lines.append(lines[i].strip())
+            if i not in planner_set and any(word.startswith("V") and word[1:].isdigit() for word in lines[i].split()):
                 break
-            planner_lines.append(line.strip())
-    if planner_lines:
         output["Supply Planner"] = " ".join(planner_lines).strip()
-    
-    return output
\ No newline at end of file
+
+    return output
@@ -0,0 +1,204 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# Stage timings and document counters, exposed in Prometheus text format at GET /metrics.
+# With PDF_METRICS=0 every hook returns immediately (stage() hands out one shared no-op context).
+ENABLED = os.environ.get("PDF_METRICS", "1") != "0"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_NULL = nullcontext()
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {_format(value)}" for key, value in items]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values):
+        with self._lock:
+            for key, value in values.items():
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _format(bound))
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_format(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                key = tuple(key)
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self.metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # Worker processes record into their own registry; the parent merges what they send back
+    def snapshot(self):
+        if not ENABLED:
+            return None
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def merge(self, snapshot):
+        if not snapshot:
+            return
+        for name, values in snapshot.items():
+            if name in self.metrics:
+                self.metrics[name].merge(values)
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("pdf_stage_seconds", "Time spent in each parser stage (per page / per block for the fine-grained stages)", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("pdf_stage_errors_total", "Exceptions raised inside each parser stage", ("stage",))
+DOCUMENT_SECONDS = REGISTRY.histogram("pdf_document_seconds", "End-to-end parse time per document")
+PAGES_PER_SECOND = REGISTRY.histogram("pdf_pages_per_second", "Parse throughput per document", buckets=RATE_BUCKETS)
+ITEMS_PER_DOCUMENT = REGISTRY.histogram("pdf_items_per_document", "Line items parsed per document", buckets=COUNT_BUCKETS)
+DOCUMENTS = REGISTRY.counter("pdf_documents_total", "Documents parsed, by outcome (ok / empty / error)", ("outcome",))
+REQUEST_SECONDS = REGISTRY.histogram("pdf_http_request_seconds", "HTTP request latency by route and status", ("route", "status"))
+
+
+@contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(1, name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def stage(name):
+    # with metrics.stage("segmentation"): ...
+    if not ENABLED:
+        return _NULL
+    return _timed_stage(name)
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+
+
+def observe_document(seconds, pages, items, outcome):
+    if not ENABLED:
+        return
+    DOCUMENT_SECONDS.observe(seconds)
+    if seconds > 0:
+        PAGES_PER_SECOND.observe(pages / seconds)
+    ITEMS_PER_DOCUMENT.observe(items)
+    DOCUMENTS.inc(1, outcome)
+
+
+def render():
+    return REGISTRY.render()
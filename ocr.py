@@ -0,0 +1,189 @@
+import io
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+from pdfminer.pdftypes import resolve1, PDFStream
+
+try:
+    import pytesseract
+except ImportError:  # OCR is optional: scanned pages then simply stay empty
+    pytesseract = None
+
+# OCR fallback for pages without a usable text layer (scanned POs); "0" turns it off
+OCR_ENABLED = os.environ.get("PDF_OCR", "1") != "0"
+OCR_DPI = int(os.environ.get("PDF_OCR_DPI", 300))
+OCR_LANG = os.environ.get("PDF_OCR_LANG", "eng")
+# Rasterizing and tesseract are CPU bound, so pages are spread over processes
+OCR_WORKERS = int(os.environ.get("PDF_OCR_WORKERS", os.cpu_count() or 1))
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get("PDF_OCR_CACHE_MAX_ENTRIES", 1024))
+# Optional on-disk tier so re-uploads of a scanned PO are not OCR'd again after a restart
+OCR_CACHE_DIR = os.environ.get("PDF_OCR_CACHE_DIR")
+
+_pool = None
+_pool_lock = threading.Lock()
+_warned = False
+
+
+def ocr_available():
+    if pytesseract is None:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+# One pool of OCR_WORKERS processes for the whole server, created on first use and never resized:
+# concurrent requests share it, and a request with fewer pages just submits fewer chunks
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS))
+        return _pool
+
+
+def _stream_bytes(obj):
+    obj = resolve1(obj)
+    if not isinstance(obj, PDFStream):
+        return b""
+    data = obj.get_rawdata()
+    return data if data is not None else obj.get_data()
+
+
+def page_content_hash(page):
+    # What the page draws: its content streams and the (image) XObjects they paint, plus the
+    # geometry the raster depends on. Unchanged pages of a re-uploaded PO hash the same.
+    page_obj = page.page_obj
+    h = hashlib.sha256(repr((page.bbox, page.rotation)).encode())
+    for stream in page_obj.contents or []:
+        h.update(_stream_bytes(stream))
+    xobjects = resolve1((page_obj.resources or {}).get("XObject")) or {}
+    for name in sorted(xobjects, key=str):
+        h.update(str(name).encode())
+        h.update(_stream_bytes(xobjects[name]))
+    return h.hexdigest()
+
+
+def lacks_text_layer(page):
+    # No fonts (directly or in form XObjects) means nothing on the page can extract as text
+    resources = page.page_obj.resources or {}
+    if resolve1(resources.get("Font")):
+        return False
+    xobjects = resolve1(resources.get("XObject")) or {}
+    for xobject in xobjects.values():
+        xobject = resolve1(xobject)
+        subtype = xobject.attrs.get("Subtype") if isinstance(xobject, PDFStream) else None
+        if getattr(subtype, "name", subtype) == "Form":
+            return False
+    return True
+
+
+def ocr_image(page, dpi=OCR_DPI, lang=OCR_LANG):
+    image = page.to_image(resolution=dpi).original
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def _ocr_page_range(source, page_nums, dpi, lang):
+    # Runs in a worker process, which opens the file itself
+    with pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source) as pdf:
+        return [(n, ocr_image(pdf.pages[n], dpi, lang)) for n in page_nums]
+
+
+class OcrCache:
+    """OCR text keyed by page-content hash and OCR settings, in an LRU memory tier and optional disk tier."""
+
+    def __init__(self, max_entries=OCR_CACHE_MAX_ENTRIES, directory=OCR_CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    text = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(key, text)
+            return text
+        return None
+
+    def put(self, key, text):
+        self._remember(key, text)
+        if self.directory:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(text, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OcrCache()
+        return _cache
+
+
+def ocr_pages(pdf, page_nums, source=None, dpi=OCR_DPI, lang=OCR_LANG, workers=OCR_WORKERS):
+    # {page_num: text} for the given pages of an open pdfplumber document.
+    # Cached pages are returned as is; the rest are OCR'd, across processes when there are several.
+    global _warned
+    cache = get_ocr_cache()
+    results, keys, todo = {}, {}, []
+    for n in page_nums:
+        keys[n] = f"{page_content_hash(pdf.pages[n])}-{dpi}-{lang}"
+        text = cache.get(keys[n])
+        if text is None:
+            todo.append(n)
+        else:
+            results[n] = text
+    if not todo:
+        return results
+
+    if not ocr_available():
+        if not _warned:
+            print("⚠️ Pages without a text layer found, but tesseract is not available — skipping OCR")
+            _warned = True
+        return results
+
+    print(f"🔍 OCR on {len(todo)} page(s) without a text layer at {dpi} DPI")
+    workers = min(workers, len(todo))
+    if workers > 1 and source is not None:
+        pool = _get_pool()
+        chunks = [todo[i::workers] for i in range(workers)]
+        futures = [pool.submit(_ocr_page_range, source, chunk, dpi, lang) for chunk in chunks]
+        done = [pair for future in futures for pair in future.result()]
+    else:
+        done = [(n, ocr_image(pdf.pages[n], dpi, lang)) for n in todo]
+
+    for n, text in done:
+        cache.put(keys[n], text)
+        results[n] = text
+    return results
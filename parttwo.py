@@ -1,20 +1,105 @@
-import pdfplumber
 import re
-import json
+import hashlib
+import itertools
+import fields
+import metrics
+import segments
+from records import GeneralInfo, ProductItem
+from pdftext import open_document
 
 STOPWORDS = ["HOUSE", "ANTI WIND", "ADULT", "AUTO OPEN", "WIND", "AUTO-OPEN", "OPEN"]
+ARTICLE_HEADING = re.compile(r'ARTICLE GENERAL INFORMATION', re.IGNORECASE)
+STYLE_LABEL = re.compile(r'STYLE\s*[:\-]?\s*([A-Z0-9]{6,10})\b', re.IGNORECASE)
+ARTICLE_NAME = re.compile(r'^\d+\)\s*(.*?)(?:\s*(?:\d{1,4}\s*PC|\d{1,4},\d{1,2}\s*USD)|\Z)')
+STYLE_NUMBER = re.compile(r'\b([A-Z0-9]{9,10})\b(?!\s*PC|\s*USD)')
+ARTICLE_NUMBER = re.compile(r'\b(\d{8,11})\b(?!\d)')
+SIZE_LINE = re.compile(r'SIZE:\s*([A-Z0-9\- ]+)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
 
 def extract_general_info_blocks(text):
-    pattern = r'(ARTICLE GENERAL INFORMATION.*?)(?=ARTICLE GENERAL INFORMATION|\Z)'
-    matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
+    matches = segments.general_info_sections(text)
     if not matches:
         print("Warning: No 'ARTICLE GENERAL INFORMATION' sections found.")
     return matches
 
+# Incremental version of extract_general_info_blocks: takes text as it arrives and
+# yields each section once the next heading (or the end of the text) closes it.
+# A chunk must start at a page marker so a heading never spans two chunks.
+def iter_general_info_sections(chunks):
+    pending = ""
+    for chunk in chunks:
+        scan_from = max(1, len(pending))
+        pending += chunk
+        cut = 0
+        for m in ARTICLE_HEADING.finditer(pending, scan_from):
+            yield pending[cut:m.start()]
+            cut = m.start()
+        pending = pending[cut:]
+    if pending:
+        yield pending
+
+# Records for each closed section, in the same order parse_combined_pdf builds them.
+# If the first section has no total of its own, the document-wide total comes from a
+# later section, so output is held back until that section (or the end) is reached,
+# unless the caller already knows the total (known_total).
+# reuse: {text digest: parsed section} shared with a previous parse (revisions); a section whose
+# text is unchanged is taken from it instead of being parsed again, new ones are added to it.
+def iter_section_records(sections, known_total=None, reuse=None):
+    held = None
+    for i, section in enumerate(sections):
+        if reuse is None:
+            total, general_info, items = parse_section(section)
+        else:
+            key = ("section", hashlib.sha1(section.encode()).hexdigest())
+            if key not in reuse:
+                reuse[key] = parse_section(section)
+            total, general_info, items = reuse[key]
+
+        records = []
+        if total is not None:
+            records.append({"Total quantity of articles": total})
+        if general_info:
+            records.append({"ARTICLE GENERAL INFORMATION": general_info})
+        records.extend(items)
+
+        if i == 0 and total is None:
+            if known_total is not None:
+                yield {"Total quantity of articles": known_total}
+                yield from records
+            else:
+                held = records
+        elif held is not None:
+            if total is not None:
+                yield {"Total quantity of articles": total}
+                yield from held
+                held = None
+                yield from records
+            else:
+                held.extend(records)
+        else:
+            yield from records
+
+    if held is not None:
+        yield from held
+
+# (total, general info, items) of one section
+def parse_section(section):
+    with metrics.stage("block_parsing"):
+        general_info = parse_general_info(section)
+    total = general_info.pop("Total quantity of articles", None)
+    general_info = GeneralInfo(general_info)
+    items = []
+    with metrics.stage("segmentation"):
+        blocks = extract_product_blocks(section)
+    for block in blocks:
+        with metrics.stage("block_parsing"):
+            item = parse_product_block(block, general_info)
+        if item:
+            items.append(item)
+    return total, general_info, items
+
 def extract_product_blocks(section_text):
-    pattern = r'(^\d+\).*?)(?=\n\d+\)|^\d+\)|^ARTICLE GENERAL INFORMATION|\Z)'
-    blocks = re.findall(pattern, section_text, re.MULTILINE | re.DOTALL)
-    return blocks
+    return segments.product_blocks(section_text)
 
 def extract_article_name_and_styles(block):
     lines = block.strip().splitlines()
@@ -25,7 +110,7 @@ def extract_article_name_and_styles(block):
     flat = " ".join(lines[:6])
 
     # Check for explicit STYLE label first
-    style_match = re.search(r'STYLE\s*[:\-]?\s*([A-Z0-9]{6,10})\b', flat, re.IGNORECASE)
+    style_match = STYLE_LABEL.search(flat)
     if style_match:
         style_numbers = [style_match.group(1).strip()]
         # If STYLE is labeled, set article name up to the style
@@ -34,42 +119,49 @@ def extract_article_name_and_styles(block):
             article_name = article_name_match.group(1).strip()
     else:
         # If no STYLE label, capture the full line as article name and detect style numbers separately
-        article_name_match = re.match(r'^\d+\)\s*(.*?)(?:\s*(?:\d{1,4}\s*PC|\d{1,4},\d{1,2}\s*USD)|\Z)', flat)
+        article_name_match = ARTICLE_NAME.match(flat)
         if article_name_match:
             article_name = article_name_match.group(1).strip()
-        style_matches = re.findall(r'\b([A-Z0-9]{9,10})\b(?!\s*PC|\s*USD)', flat)
+        style_matches = STYLE_NUMBER.findall(flat)
         style_numbers = style_matches[:2]
 
     for line in lines:
-        if m := re.search(r'\b(\d{8,11})\b(?!\d)', line):
+        if m := ARTICLE_NUMBER.search(line):
             article_number = m.group(1)
             break
 
     return article_name, style_numbers, article_number
 
+GENERAL_INFO_FIELDS = (
+    fields.STYLE,
+    fields.BRAND,
+    fields.COUNTRY_OF_ORIGIN,
+    fields.CUSTOMS_TARIFF_NUMBER,
+    fields.PREHANDLING_INFO,
+    fields.PARCEL_LABEL_CODE,
+    fields.SALES_LOT,
+    fields.TOTAL_QUANTITY,
+)
+
+PRODUCT_FIELDS = (
+    fields.QUANTITY_ANY_CASE,
+    fields.PRICE_ANY_CASE,
+    fields.EAN_CODE,
+    fields.SUPP_ART_NO_SOK,  # SOK... codes or "206H302111"-like numbers
+    fields.COLOUR_FULL_NAME,
+    fields.SIZE,
+)
+SALES_LOT_FIELDS = (fields.SALES_LOT,)
+
 def parse_general_info(text):
-    info = {}
-    if m := re.search(r'STYLE\s*[:\-]?\s*([A-Z0-9\-]{6,})', text, re.IGNORECASE):
-        info["Style"] = m.group(1).strip()
-    if m := re.search(r'BRAND:\s*(\S+)', text):
-        info["Brand"] = m.group(1).strip()
-    if m := re.search(r'COUNTRY OF ORIGIN:\s*(\S+)', text):
-        info["Country of Origin"] = m.group(1).strip()
-    if m := re.search(r'CUSTOMS TARIFF NUMBER:\s*(\d+)', text):
-        info["Customs Tariff Number"] = m.group(1).strip()
-    if m := re.search(r'PREHANDLING INFO:\s*(PREHANDLING INCLUDED)', text):
-        info["Prehandling Info"] = m.group(1).strip()
-    if m := re.search(r'PARCEL LABEL CODE:\s*(\S+)', text):
-        info["Parcel Label Code"] = m.group(1).strip()
-    if m := re.search(r'SALES LOT\s*(?:SL)?:\s*(\d+\s*PC)', text, re.IGNORECASE):
-        info["Sales Lot"] = m.group(1).strip()
-    if m := re.search(r'Total\s*(?:quantity\s*)?of\s*articles\s*:\s*(\d+\s*PC)', text, re.IGNORECASE):
-        info["Total quantity of articles"] = m.group(1).strip()
-    return info
+    return fields.extract_fields(GENERAL_INFO_FIELDS, text)
 
+# The item keeps a reference to its section's general info; data holds only its own fields
 def parse_product_block(block, general_info):
-    data = general_info.copy()
-    flat = re.sub(r'\s+', ' ', block)
+    data = {}
+    # Record slots are only set for the keys a section has, so an absent STYLE reads through getattr
+    has_style = getattr(general_info, "style", None) is not None
+    flat = WHITESPACE.sub(' ', block)
 
     article_name, style_numbers, art_number = extract_article_name_and_styles(block)
     if article_name:
@@ -80,104 +172,71 @@ def parse_product_block(block, general_info):
                 if style in article_name:
                     append_style = False
                     break
-            if append_style and "Style" not in data and style_numbers:
+            if append_style and not has_style and style_numbers:
                 article_name = f"{article_name} {style_numbers[0]}".strip()
         data["Article Name"] = article_name
     if art_number:
         data["Art No"] = art_number
-    if style_numbers and "Style" not in data:
+    if style_numbers and not has_style:
         data["Style"] = ", ".join(style_numbers) if len(style_numbers) > 1 else style_numbers[0]
 
-    if m := re.search(r'\b([\d.,]+)\s+(PC)\b', flat, re.IGNORECASE):
-        data["Quantity"] = m.group(1).strip()
-        data["Unit"] = m.group(2).strip()
-
-    if m := re.search(r'([\d.,]+)\s+USD\b', flat, re.IGNORECASE):
-        data["Price/Unit Gross"] = m.group(1).strip() + " USD"
-
-    if m := re.search(r'\b(\d{13})\b', flat):
-        data["EAN Code"] = m.group(1)
-
-    # Updated pattern with OR to include "206H302111"-like pattern
-    if m := re.search(r'\b(SOK[A-Z0-9\-_]+|206[A-Z0-9]{7})\b', flat, re.IGNORECASE):
-        data["Supp. Art. No"] = m.group(1).strip()
-
-    if m := re.search(r'COLOUR:\s*', flat, re.IGNORECASE):
-        start = m.end()
-        tail = flat[start:]
-        stopwords = ["SIZE:", "SALES LOT", "BRAND:", "COUNTRY OF ORIGIN:", "CUSTOMS TARIFF", "PREHANDLING", "PARCEL LABEL"]
-        stop = len(tail)
-        for word in stopwords:
-            idx = tail.upper().find(word)
-            if idx != -1 and idx < stop:
-                stop = idx
-        colour = tail[:stop].strip()
-        # Append 'SORBET' if it's the exact expected color
-        if colour.upper() == "18-2043TCX RASPBERRY":
-            colour += " SORBET"
-        elif colour.upper() == "18-3840TCX PURPLE":
-            colour += " OPULENCE"
-        if colour:
-            data["Colour"] = colour
-
-    if m := re.search(r'SIZE:\s*([A-Z0-9\- ]+?)(?:\s+(?:SALES LOT SL|\Z|$))', flat, re.IGNORECASE):
-        data["Size"] = m.group(1).strip()
-    else:
+    fields.extract_fields(PRODUCT_FIELDS, flat, data)
+
+    if "Size" not in data:
         for line in block.strip().splitlines():
-            if m := re.search(r'SIZE:\s*([A-Z0-9\- ]+)', line, re.IGNORECASE):
+            if m := SIZE_LINE.search(line):
                 data["Size"] = m.group(1).strip()
                 break
         if "Size" not in data:
             data["Size"] = "NOT_SPECIFIED"
 
-    if m := re.search(r'SALES LOT\s*(?:SL)?:\s*(\d+\s*PC)', flat, re.IGNORECASE):
-        data["Sales Lot"] = m.group(1).strip()
+    fields.extract_fields(SALES_LOT_FIELDS, flat, data)
+
+    return ProductItem(general_info, data)
+
+# Page text in "--- Page N ---" chunks; pages without text contribute their words instead
+def iter_text_chunks(doc):
+    for page_num, txt in doc.iter_page_text(range(len(doc)), x_tolerance=3):
+        if txt:
+            yield f"\n--- Page {page_num + 1} ---\n" + txt + "\n"
+        else:
+            words = doc.page_words(page_num)
+            if words:
+                yield f"\n--- Page {page_num + 1} (Words) ---\n" + " ".join(w["text"] for w in words) + "\n"
+
+# Records of a heading-layout PDF, section by section as pages are read, so only the
+# current section's text is held (text before the first heading is only scanned for a total)
+def iter_pdf_with_heading(doc):
+    chunks = iter_text_chunks(doc)
+    before_text = ""
+    for chunk in chunks:
+        match = ARTICLE_HEADING.search(chunk)
+        if match:
+            break
+        before_text += chunk
+    else:
+        # No heading anywhere: the whole text is one section
+        print("Warning: No 'ARTICLE GENERAL INFORMATION' sections found.")
+        if before_text:
+            yield from iter_section_records([before_text])
+        return
 
-    return data
+    total_match = fields.TOTAL_QUANTITY.regex.search(before_text + chunk[:match.start()])
+    known_total = total_match.group(1).strip() if total_match else None
+    sections = iter_general_info_sections(itertools.chain([chunk[match.start():]], chunks))
+    yield from iter_section_records(sections, known_total)
 
-def parse_pdf_with_heading(pdf_path):
+def parse_pdf_with_heading(source, **options):
     final_result = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            for page_num in range(len(pdf.pages)):
-                page = pdf.pages[page_num]
-                txt = page.extract_text(x_tolerance=3)
-                if txt:
-                    full_text += f"\n--- Page {page_num + 1} ---\n" + txt + "\n"
-                else:
-                    words = page.extract_words()
-                    if words:
-                        full_text += f"\n--- Page {page_num + 1} (Words) ---\n" + " ".join(w["text"] for w in words) + "\n"
-
-            general_sections = extract_general_info_blocks(full_text)
-            if not general_sections:
-                general_sections = [full_text]
-
-            total_qty_match = re.search(r'Total\s*(?:quantity\s*)?of\s*articles\s*:\s*(\d+\s*PC)', full_text, re.IGNORECASE)
-            global_total = {"Total quantity of articles": total_qty_match.group(1).strip()} if total_qty_match else None
-
-            for i, section in enumerate(general_sections):
-                general_info = parse_general_info(section)
-                if "Total quantity of articles" in general_info:
-                    final_result.append({"Total quantity of articles": general_info.pop("Total quantity of articles")})
-                elif global_total and i == 0:
-                    final_result.append(global_total)
-                if general_info:
-                    final_result.append({"ARTICLE GENERAL INFORMATION": general_info})
-
-                product_blocks = extract_product_blocks(section)
-                for block in product_blocks:
-                    item = parse_product_block(block, general_info)
-                    if item:
-                        final_result.append(item)
+        with open_document(source, **options) as doc:
+            for record in iter_pdf_with_heading(doc):
+                final_result.append(record)
 
     except Exception as e:
         print("❌ Error while processing PDF:", e)
 
-    if final_result:
-        with open("combined.json", "w", encoding="utf-8") as f:
-            json.dump(final_result, f, indent=4, ensure_ascii=False)
-        print("✅ Saved to combined.json")
-    else:
-        print("⚠️ No valid data extracted.")
\ No newline at end of file
+    if not final_result:
+        print("⚠️ No valid data extracted.")
+
+    return final_result
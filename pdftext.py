@@ -0,0 +1,360 @@
+import io
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+import ocr
+import metrics
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:  # the fast text-layer engine is optional
+    PdfReader = None
+
+# pdfplumber's own defaults, so extract_text() and extract_text(x_tolerance=3) share one cache entry
+DEFAULT_TEXT_PARAMS = {"x_tolerance": 3, "y_tolerance": 3}
+
+# Opt-in parallel page extraction: 0 workers keeps everything serial
+PARALLEL_WORKERS = int(os.environ.get("PDF_PARALLEL_WORKERS", 0))
+# Documents shorter than this are not worth shipping to other processes
+PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 16))
+
+# Text extraction policy:
+#   "pdfplumber" - full character-level layout analysis on every page (default)
+#   "text"       - the PDF's embedded text layer via PyPDF2, much faster
+#   "auto"       - text layer first, pdfplumber for pages that fail the sanity checks
+TEXT_ENGINE = os.environ.get("PDF_TEXT_ENGINE", "pdfplumber")
+TEXT_ENGINES = ("pdfplumber", "text", "auto")
+
+# Low-memory mode: each page's parsed layout is released as soon as its text is taken, and
+# streamed page text is dropped once the consumer moves on, so memory stays flat with page count
+LOW_MEMORY = os.environ.get("PDF_LOW_MEMORY", "0") == "1"
+
+# How the layout heading is looked for before full extraction:
+#   "text" - probe the cheap text layer first, full extraction only where it is empty
+#   "full" - full extraction of every page until the heading is found
+LAYOUT_PROBE = os.environ.get("PDF_LAYOUT_PROBE", "text")
+
+ITEM_MARKER = re.compile(r'^\d+\)', re.MULTILINE)
+ITEM_CONTENT = re.compile(r'\b\d{13}\b|\b\d+\s+PC\b')
+ORDER_WORD = re.compile(r'\bORDER\b')
+NO_WORD = re.compile(r'\bNO\b')
+# Longer average "words" mean the text layer lost its spaces
+MAX_AVG_WORD_LENGTH = 20
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def _extract_page_range(source, page_nums, params, engine):
+    # Runs in a worker process, which opens the file itself
+    # OCR stays with the parent, which batches text-less pages into its own pool
+    with PdfDocument(source, workers=0, engine=engine, ocr_fallback=False) as doc:
+        pages = []
+        for n in page_nums:
+            start = time.perf_counter()
+            text = doc.page_text(n, **params)
+            pages.append((n, text, doc.page_engines.get(n), time.perf_counter() - start))
+        return pages
+
+
+def text_layer_looks_sane(page_num, text):
+    # Cheap checks that the text layer carries what the parsers look for
+    if not text or not text.strip():
+        return False
+    upper = text.upper()
+    if page_num == 0 and not (ORDER_WORD.search(upper) and NO_WORD.search(upper)):
+        return False
+    if ITEM_CONTENT.search(text) and not ITEM_MARKER.search(text):
+        return False
+    words = text.split()
+    if sum(map(len, words)) / len(words) > MAX_AVG_WORD_LENGTH:
+        return False
+    return True
+
+
+class PdfplumberEngine:
+    name = "pdfplumber"
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def page_text(self, page_num, **params):
+        page = self.doc.pdf.pages[page_num]
+        text = page.extract_text(**params)
+        if self.doc.low_memory:
+            page.close()
+        return text
+
+
+class TextLayerEngine:
+    """Reads the embedded text layer with PyPDF2, skipping character-level layout analysis."""
+
+    name = "text"
+
+    def __init__(self, doc):
+        self.doc = doc
+        self._reader = None
+        self._text = {}
+
+    def page_text(self, page_num, **params):
+        # Layout params don't apply to the text layer, so one extraction serves every variant
+        if page_num not in self._text:
+            if self._reader is None:
+                source = self.doc._worker_source()
+                self._reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+            self._text[page_num] = self._reader.pages[page_num].extract_text()
+        return self._text[page_num]
+
+
+def _split_ranges(page_nums, parts):
+    # Contiguous, evenly sized chunks so each worker parses neighbouring pages
+    size, extra = divmod(len(page_nums), parts)
+    chunks, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            chunks.append(page_nums[start:end])
+        start = end
+    return chunks
+
+
+def _params_key(params, defaults=None):
+    merged = dict(defaults or {})
+    merged.update(params)
+    return tuple(sorted(merged.items()))
+
+
+class PdfDocument:
+    """A PDF opened once per request, with page text cached by (page, extraction params)."""
+
+    def __init__(self, source, workers=None, min_parallel_pages=None, engine=None, ocr_fallback=None, low_memory=None):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.source = source
+        with metrics.stage("open"):
+            self.pdf = pdfplumber.open(source)
+        self.workers = PARALLEL_WORKERS if workers is None else workers
+        self.min_parallel_pages = PARALLEL_MIN_PAGES if min_parallel_pages is None else min_parallel_pages
+        self.engine = TEXT_ENGINE if engine is None else engine
+        if self.engine not in TEXT_ENGINES:
+            raise ValueError(f"Unknown text engine {self.engine!r}, expected one of {TEXT_ENGINES}")
+        if self.engine != "pdfplumber" and PdfReader is None:
+            print("⚠️ PyPDF2 is not installed — using pdfplumber for every page")
+            self.engine = "pdfplumber"
+        self.engines = {"pdfplumber": PdfplumberEngine(self), "text": TextLayerEngine(self)}
+        self.ocr_fallback = ocr.OCR_ENABLED if ocr_fallback is None else ocr_fallback
+        self.low_memory = LOW_MEMORY if low_memory is None else low_memory
+        # Which engine produced the text of each page
+        self.page_engines = {}
+        self._text = {}
+        self._words = {}
+        # OCR text per page ("" when OCR was tried but unavailable)
+        self._ocr = {}
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    @property
+    def pages(self):
+        return self.pdf.pages
+
+    def page_text(self, page_num, **params):
+        key = (page_num, _params_key(params, DEFAULT_TEXT_PARAMS))
+        if key not in self._text:
+            self._text[key] = self._extract_text(page_num, params)
+        return self._text[key]
+
+    def _extract_text(self, page_num, params):
+        with metrics.stage("page_extraction"):
+            text = self._layer_text(page_num, params)
+        return self._with_ocr(page_num, text)
+
+    def _layer_text(self, page_num, params):
+        if self.engine != "pdfplumber":
+            try:
+                text = self.engines["text"].page_text(page_num, **params)
+            except Exception as e:
+                print(f"⚠️ Text layer unreadable on page {page_num + 1}: {e}")
+                text = None
+            if text is not None and (self.engine == "text" or text_layer_looks_sane(page_num, text)):
+                self.page_engines[page_num] = "text"
+                return text
+        self.page_engines[page_num] = "pdfplumber"
+        return self.engines["pdfplumber"].page_text(page_num, **params)
+
+    def _with_ocr(self, page_num, text):
+        # Pages with no usable text (scanned) get their OCR text instead
+        if not self.ocr_fallback or (text and text.strip()):
+            return text
+        if page_num not in self._ocr:
+            self.ocr_pages([page_num])
+        if self._ocr[page_num]:
+            self.page_engines[page_num] = "ocr"
+            return self._ocr[page_num]
+        return text
+
+    def ocr_pages(self, page_nums):
+        # OCR several pages in one batch, so they are rasterized and recognised concurrently
+        todo = [n for n in page_nums if n not in self._ocr]
+        if not todo:
+            return
+        source = self._worker_source() if len(todo) > 1 else None
+        with metrics.stage("ocr"):
+            found = ocr.ocr_pages(self.pdf, todo, source=source)
+        for n in todo:
+            self._ocr[n] = found.get(n, "")
+
+    def prepare_ocr(self, page_nums):
+        # Batch-OCR the pages that cannot have a text layer before they are asked for one by one
+        if self.ocr_fallback:
+            self.ocr_pages([n for n in page_nums if n not in self._ocr and ocr.lacks_text_layer(self.pdf.pages[n])])
+
+    def probe_text(self, page_num):
+        # Cheapest text available for a quick look at a page: any cached extraction,
+        # then the text layer, and only then a full (cached) extraction
+        for (n, _), text in self._text.items():
+            if n == page_num and text:
+                return text
+        if LAYOUT_PROBE == "text" and PdfReader is not None:
+            try:
+                text = self.engines["text"].page_text(page_num)
+            except Exception:
+                text = None
+            if text and text.strip():
+                return text
+        return self.page_text(page_num, x_tolerance=3)
+
+    def engine_report(self):
+        # {engine name: [1-based page numbers]}
+        report = {}
+        for page_num in sorted(self.page_engines):
+            report.setdefault(self.page_engines[page_num], []).append(page_num + 1)
+        return report
+
+    def prefetch(self, page_nums, **params):
+        # Fill the text cache for many pages at once, across processes when enabled
+        key = _params_key(params, DEFAULT_TEXT_PARAMS)
+        missing = [n for n in page_nums if (n, key) not in self._text]
+        if self.workers > 1 and len(missing) >= self.min_parallel_pages:
+            pool = _get_pool(self.workers)
+            source = self._worker_source()
+            futures = [pool.submit(_extract_page_range, source, chunk, params, self.engine)
+                       for chunk in _split_ranges(missing, self.workers)]
+            for future in futures:
+                for n, text, engine, seconds in future.result():
+                    metrics.observe_stage("page_extraction", seconds)
+                    self.page_engines[n] = engine
+                    self._text[(n, key)] = self._with_ocr(n, text)
+        else:
+            for n in missing:
+                self.page_text(n, **params)
+
+    @property
+    def stream_window(self):
+        # Pages fetched ahead of the consumer: one at a time when serial, a parallel batch otherwise
+        if self.workers > 1:
+            return max(self.min_parallel_pages, 4 * self.workers)
+        return 1
+
+    def iter_page_text(self, page_nums, **params):
+        page_nums = list(page_nums)
+        self.prepare_ocr(page_nums)
+        window = self.stream_window
+        for start in range(0, len(page_nums), window):
+            batch = page_nums[start:start + window]
+            self.prefetch(batch, **params)
+            for n in batch:
+                yield n, self.page_text(n, **params)
+                if self.low_memory:
+                    self.release(n)
+
+    def page_snapshot(self, page_num):
+        # Everything extracted for a page, to seed the same page of another document (revisions)
+        return {
+            "text": {key: text for (n, key), text in self._text.items() if n == page_num},
+            "ocr": self._ocr.get(page_num),
+            "engine": self.page_engines.get(page_num),
+        }
+
+    def seed_page(self, page_num, snapshot):
+        # Take a page's text from a snapshot of an identical page instead of extracting it
+        for key, text in snapshot["text"].items():
+            self._text[(page_num, key)] = text
+        if snapshot["ocr"] is not None:
+            self._ocr[page_num] = snapshot["ocr"]
+        if snapshot["engine"] is not None:
+            self.page_engines[page_num] = snapshot["engine"]
+
+    def release(self, page_num):
+        # Forget everything held for a page; asking for it again re-extracts it
+        for key in [key for key in self._text if key[0] == page_num]:
+            del self._text[key]
+        for key in [key for key in self._words if key[0] == page_num]:
+            del self._words[key]
+        self.engines["text"]._text.pop(page_num, None)
+        self.pdf.pages[page_num].close()
+
+    def _worker_source(self):
+        # Worker processes reopen the PDF: by path when we have one, otherwise from its bytes
+        if isinstance(self.source, (str, os.PathLike)):
+            return self.source
+        self.source.seek(0)
+        return self.source.read()
+
+    def page_words(self, page_num, **params):
+        key = (page_num, _params_key(params))
+        if key not in self._words:
+            self._words[key] = self.pdf.pages[page_num].extract_words(**params)
+            if self.low_memory:
+                self.pdf.pages[page_num].close()
+        return self._words[key]
+
+    def region_words(self, page_num, bbox, **params):
+        # Words inside a region of the page (clipped to the page), without extracting the rest
+        key = (page_num, tuple(bbox), _params_key(params))
+        if key not in self._words:
+            page = self.pdf.pages[page_num]
+            x0, top, x1, bottom = page.bbox
+            bbox = (max(bbox[0], x0), max(bbox[1], top), min(bbox[2], x1), min(bbox[3], bottom))
+            if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+                self._words[key] = []
+            else:
+                self._words[key] = page.crop(bbox).extract_words(**params)
+        return self._words[key]
+
+    def close(self):
+        self.pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def open_document(source, **options):
+    # Reuse a document that is already open, otherwise open (and close) it here
+    if isinstance(source, PdfDocument):
+        yield source
+    else:
+        with PdfDocument(source, **options) as doc:
+            yield doc
@@ -0,0 +1,209 @@
+import threading
+
+# Typed records the parsers build instead of one dict per item. Product items point at their
+# section's GeneralInfo rather than copying it, low-cardinality values (units, sizes, colours,
+# brands, ...) are shared through a small intern table, and to_dict() rebuilds exactly the
+# dict the parsers used to return (same keys, same order).
+
+# Bounded, unlike sys.intern, so a long-running server doesn't keep every value it ever saw
+INTERN_MAX_ENTRIES = 65536
+
+_interned = {}
+_intern_lock = threading.Lock()
+
+
+def intern_value(value):
+    if value is None:
+        return None
+    shared = _interned.get(value)
+    if shared is not None:
+        return shared
+    with _intern_lock:
+        if len(_interned) >= INTERN_MAX_ENTRIES:
+            _interned.clear()
+        return _interned.setdefault(value, value)
+
+
+class Record:
+    __slots__ = ("extra",)
+    # (attribute, output key) in output order, and the keys whose values repeat across items
+    FIELDS = ()
+    INTERNED = frozenset()
+    _ATTRS = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._ATTRS = {key: attr for attr, key in cls.FIELDS}
+
+    def _fill(self, values):
+        # values: {output key: value} as the field rules produced them. Only the keys present are
+        # set (absent slots read as None); keys outside FIELDS are kept in `extra`, after the
+        # known keys, so nothing a new rule adds is dropped.
+        attrs = self._ATTRS
+        interned = self.INTERNED
+        extra = None
+        for key, value in values.items():
+            attr = attrs.get(key)
+            if attr is None:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            if key in interned:
+                value = _interned.get(value) or intern_value(value)
+            setattr(self, attr, value)
+        self.extra = extra
+
+    def _own_fields(self):
+        data = {key: value for attr, key in self.FIELDS if (value := getattr(self, attr, None)) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_dict(self):
+        return self._own_fields()
+
+    def __bool__(self):
+        return self.extra is not None or any(getattr(self, attr, None) is not None for attr, _ in self.FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == to_dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class MasterMetadata(Record):
+    # Header fields vary by PO (some are only present on some orders), so they are kept as pairs
+    __slots__ = ("fields",)
+
+    def __init__(self, values):
+        self.fields = tuple((key, intern_value(value) if isinstance(value, str) else value) for key, value in values.items())
+        self.extra = None
+
+    def to_dict(self):
+        return dict(self.fields)
+
+    def __bool__(self):
+        return bool(self.fields)
+
+
+class GeneralInfo(Record):
+    # Shared by every item of its section, so its dict form is built once and copied from
+    __slots__ = ("style", "brand", "country_of_origin", "customs_tariff_number",
+                 "prehandling_info", "parcel_label_code", "sales_lot", "_dict")
+    FIELDS = (
+        ("style", "Style"),
+        ("brand", "Brand"),
+        ("country_of_origin", "Country of Origin"),
+        ("customs_tariff_number", "Customs Tariff Number"),
+        ("prehandling_info", "Prehandling Info"),
+        ("parcel_label_code", "Parcel Label Code"),
+        ("sales_lot", "Sales Lot"),
+    )
+    INTERNED = frozenset(key for _, key in FIELDS)
+
+    def __init__(self, values):
+        self._fill(values)
+        self._dict = None
+
+    def to_dict(self):
+        if self._dict is None:
+            self._dict = self._own_fields()
+        return self._dict.copy()
+
+
+class ProductItem(Record):
+    # A line item under an 'ARTICLE GENERAL INFORMATION' section; its output starts with the
+    # section's general info, and its own fields override those keys in place
+    __slots__ = ("general_info", "article_name", "art_no", "style", "quantity", "unit", "price",
+                 "ean_code", "supp_art_no", "colour", "size", "sales_lot")
+    FIELDS = (
+        ("article_name", "Article Name"),
+        ("art_no", "Art No"),
+        ("style", "Style"),
+        ("quantity", "Quantity"),
+        ("unit", "Unit"),
+        ("price", "Price/Unit Gross"),
+        ("ean_code", "EAN Code"),
+        ("supp_art_no", "Supp. Art. No"),
+        ("colour", "Colour"),
+        ("size", "Size"),
+        ("sales_lot", "Sales Lot"),
+    )
+    INTERNED = frozenset(("Article Name", "Style", "Quantity", "Unit", "Price/Unit Gross", "Colour", "Size", "Sales Lot"))
+
+    def __init__(self, general_info, values):
+        self.general_info = general_info
+        self._fill(values)
+
+    def to_dict(self):
+        if self.general_info is None:
+            return self._own_fields()
+        data = self.general_info.to_dict()
+        data.update(self._own_fields())
+        return data
+
+    def __bool__(self):
+        return bool(self.general_info) or Record.__bool__(self)
+
+
+class ArticleItem(Record):
+    # A line item of the layout without the heading (partone)
+    __slots__ = ("style", "article", "quantity", "unit", "price", "info", "ean_code", "art_no",
+                 "supp_art_no", "colour", "size", "sales_lot", "brand", "country_of_origin",
+                 "customs_tariff_number", "prehandling_info", "parcel_label_code")
+    FIELDS = (
+        ("style", "Style"),
+        ("article", "Article"),
+        ("quantity", "Quantity"),
+        ("unit", "Unit"),
+        ("price", "Price/Unit Gross"),
+        ("info", "Info"),
+        ("ean_code", "EAN Code"),
+        ("art_no", "Art No"),
+        ("supp_art_no", "Supp. Art. No"),
+        ("colour", "Colour"),
+        ("size", "Size"),
+        ("sales_lot", "Sales Lot"),
+        ("brand", "Brand"),
+        ("country_of_origin", "Country of Origin"),
+        ("customs_tariff_number", "Customs Tariff Number"),
+        ("prehandling_info", "Prehandling Info"),
+        ("parcel_label_code", "Parcel Label Code"),
+    )
+    INTERNED = frozenset(("Style", "Article", "Quantity", "Unit", "Price/Unit Gross", "Colour", "Size", "Sales Lot",
+                          "Brand", "Country of Origin", "Customs Tariff Number", "Prehandling Info", "Parcel Label Code"))
+
+    def __init__(self, values):
+        self._fill(values)
+
+
+# Keys of the single-key dicts the pipeline yields around the records that aren't line items
+WRAPPER_KEYS = ("MASTER METADATA", "ARTICLE GENERAL INFORMATION", "Total quantity of articles")
+
+
+def is_item(record):
+    # True for a line item (record or dict), False for the metadata, general-info and total wrappers
+    return not (isinstance(record, dict) and len(record) == 1 and next(iter(record)) in WRAPPER_KEYS)
+
+
+def to_dict(record):
+    # Plain-dict form of anything the pipeline yields: a record, or a small dict wrapping one
+    # ({"MASTER METADATA": ...}, {"ARTICLE GENERAL INFORMATION": ...}); other values pass through
+    if isinstance(record, Record):
+        return record.to_dict()
+    if isinstance(record, dict):
+        return {key: to_dict(value) for key, value in record.items()}
+    return record
+
+
+def json_default(obj):
+    # `default` hook for json / orjson / msgpack encoders, so records serialize without a dict copy first
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
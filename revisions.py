@@ -0,0 +1,225 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from pdfminer.pdftypes import resolve1, PDFStream
+
+import ocr
+import records
+from main import iter_combined_pdf
+from master import extract_master_metadata
+from pdftext import PdfDocument
+
+# Revision-aware parsing: per order number we keep the last revision's page hashes, the text
+# extracted from each page and the parsed sections/blocks. A new revision of the order only
+# extracts the pages whose content changed and only parses the sections whose text changed;
+# the response carries a diff of the items against the previous revision.
+REVISION_MAX_ORDERS = int(os.environ.get("PDF_REVISION_MAX_ORDERS", 64))
+
+MASTER_KEY = "MASTER METADATA"
+# Numbers that identify an item on a page (EAN codes, article numbers)
+ITEM_NUMBER = re.compile(r'\b\d{8,13}\b')
+
+
+def page_fingerprint(page):
+    # What the page draws (see ocr.page_content_hash) plus its fonts, which decide how that reads as text
+    h = hashlib.sha256(ocr.page_content_hash(page).encode())
+    fonts = resolve1((page.page_obj.resources or {}).get("Font")) or {}
+    for name in sorted(fonts, key=str):
+        font = resolve1(fonts[name]) or {}
+        h.update(str(name).encode())
+        h.update(repr(resolve1(font.get("BaseFont"))).encode())
+        to_unicode = resolve1(font.get("ToUnicode"))
+        if isinstance(to_unicode, PDFStream):
+            h.update(to_unicode.get_data())
+    return h.hexdigest()
+
+
+def item_key(item):
+    # How an item is recognised across revisions: its EAN, else article number / name with size and colour
+    if item.get("EAN Code"):
+        return item["EAN Code"]
+    name = item.get("Art No") or item.get("Article Name") or item.get("Article") or ""
+    return " | ".join(str(part) for part in (name, item.get("Size", ""), item.get("Colour", "")))
+
+
+def split_records(result):
+    # (master fields, {key: item}) of a parse result, duplicate keys numbered in order
+    master, items = {}, {}
+    for record in map(records.to_dict, result):
+        if len(record) == 1 and MASTER_KEY in record:
+            master = record[MASTER_KEY]
+        elif len(record) == 1 and next(iter(record)) in ("ARTICLE GENERAL INFORMATION", "Total quantity of articles"):
+            continue
+        else:
+            key = base = item_key(record)
+            n = 1
+            while key in items:
+                n += 1
+                key = f"{base} #{n}"
+            items[key] = record
+    return master, items
+
+
+def _changes(old, new):
+    return {key: {"old": old.get(key), "new": new.get(key)} for key in dict.fromkeys([*old, *new]) if old.get(key) != new.get(key)}
+
+
+def diff_results(old_result, new_result, new_pages=None):
+    # Added / removed / modified items (and changed master fields) between two parse results.
+    # new_pages maps item keys to the 1-based page they were found on in the new revision.
+    old_master, old_items = split_records(old_result)
+    new_master, new_items = split_records(new_result)
+    new_pages = new_pages or {}
+    diff = {"added": [], "removed": [], "modified": [], "unchanged": 0, "master": _changes(old_master, new_master)}
+    for key, item in new_items.items():
+        if key not in old_items:
+            diff["added"].append({"key": key, "page": new_pages.get(key), "item": item})
+        elif old_items[key] != item:
+            diff["modified"].append({"key": key, "page": new_pages.get(key), "changes": _changes(old_items[key], item)})
+        else:
+            diff["unchanged"] += 1
+    for key, item in old_items.items():
+        if key not in new_items:
+            diff["removed"].append({"key": key, "item": item})
+    return diff
+
+
+def attribute_items(result, snapshots):
+    # {item key: 1-based page} from where the item's EAN / article number appears in the page text
+    first_page = {}
+    for n, snapshot in enumerate(snapshots):
+        for text in snapshot["text"].values():
+            for number in ITEM_NUMBER.findall(text or ""):
+                first_page.setdefault(number, n + 1)
+    pages = {}
+    for key, item in split_records(result)[1].items():
+        for field in ("EAN Code", "Art No"):
+            if item.get(field) in first_page:
+                pages[key] = first_page[item[field]]
+                break
+    return pages
+
+
+class _Reuse(dict):
+    # Parsed sections/blocks of the base revision; remembers which keys this parse looked up,
+    # so only those are stored with the new revision
+    def __init__(self, previous=()):
+        super().__init__(previous)
+        self.used = set()
+
+    def __contains__(self, key):
+        self.used.add(key)
+        return super().__contains__(key)
+
+    def kept(self):
+        return {key: self[key] for key in self.used if dict.__contains__(self, key)}
+
+
+class RevisionStore:
+    """Latest revision per order number: page hashes and snapshots, parsed sections and the result, in LRU order."""
+
+    def __init__(self, max_orders=REVISION_MAX_ORDERS):
+        self.max_orders = max_orders
+        self._orders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, order_no):
+        with self._lock:
+            return self._orders.get(order_no)
+
+    def closest(self, hashes):
+        # The stored revision sharing the most pages with these hashes (None if none shares any)
+        wanted = set(hashes)
+        with self._lock:
+            best, best_shared = None, 0
+            for revision in self._orders.values():
+                shared = len(wanted.intersection(revision["snapshots"]))
+                if shared > best_shared:
+                    best, best_shared = revision, shared
+            return best
+
+    def put(self, revision):
+        with self._lock:
+            self._orders[revision["order_no"]] = revision
+            self._orders.move_to_end(revision["order_no"])
+            while len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+
+    def summary(self, order_no):
+        revision = self.get(order_no)
+        if revision is None:
+            return None
+        return {key: revision[key] for key in ("order_no", "revision", "sha256", "created", "pages", "page_items")}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RevisionStore()
+        return _store
+
+
+def parse_revision(source, digest=None, store=None):
+    # Parse a PO, reusing whatever is unchanged from the closest stored revision, and
+    # return the records with page reuse statistics and a diff against the order's previous revision
+    store = store or get_store()
+    start = time.perf_counter()
+    # Page text has to outlive the parse to be stored, so low-memory release is off here
+    with PdfDocument(source, low_memory=False) as doc:
+        hashes = [page_fingerprint(page) for page in doc.pages]
+        base = store.closest(hashes)
+        reuse, reused = _Reuse(base["parsed"] if base is not None else ()), []
+        if base is not None:
+            for n, page_hash in enumerate(hashes):
+                if page_hash in base["snapshots"]:
+                    doc.seed_page(n, base["snapshots"][page_hash])
+                    reused.append(n + 1)
+
+        result = list(iter_combined_pdf(doc, reuse=reuse))
+        order_no = (extract_master_metadata(doc) or {}).get("Order No")
+        snapshots = [doc.page_snapshot(n) for n in range(len(doc))]
+
+    reused_set = set(reused)
+    response = {
+        "order_no": order_no,
+        "revision": 1,
+        "previous_revision": None,
+        "pages": {"total": len(hashes), "reused": reused,
+                  "extracted": [n for n in range(1, len(hashes) + 1) if n not in reused_set]},
+        "seconds": round(time.perf_counter() - start, 6),
+        "diff": None,
+        "records": result,
+    }
+    if order_no is None:
+        print("⚠️ No order number found — revision not stored")
+        return response
+
+    page_items = attribute_items(result, snapshots)
+    previous = store.get(order_no)
+    if previous is not None:
+        response["previous_revision"] = previous["revision"]
+        response["revision"] = previous["revision"] + (0 if previous["sha256"] == digest and digest else 1)
+        response["diff"] = diff_results(previous["result"], result, page_items)
+
+    store.put({
+        "order_no": order_no,
+        "revision": response["revision"],
+        "sha256": digest,
+        "created": time.time(),
+        "pages": hashes,
+        "snapshots": dict(zip(hashes, snapshots)),
+        "parsed": reuse.kept(),
+        "result": result,
+        "page_items": page_items,
+    })
+    print(f"🔁 Order {order_no} revision {response['revision']}: {len(reused)} of {len(hashes)} page(s) reused")
+    return response
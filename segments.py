@@ -0,0 +1,105 @@
+import re
+
+# Block segmentation in one pass over the text. A line is only looked at where it starts, so the
+# cost grows with the text length however few markers a section has; the results are exactly the
+# substrings the old DOTALL lazy patterns returned:
+#   items (partone):    (^\d+\).*?)(?=^\d+\)|^Suomen Osuuskauppojen Keskuskunta|\Z)
+#   products (parttwo): (^\d+\).*?)(?=\n\d+\)|^\d+\)|^ARTICLE GENERAL INFORMATION|\Z)
+#   sections (parttwo): (ARTICLE GENERAL INFORMATION.*?)(?=ARTICLE GENERAL INFORMATION|\Z)  (any case)
+ITEM_MARKER = re.compile(r'\d+\)')
+FOOTER = "Suomen Osuuskauppojen Keskuskunta"
+HEADING = "ARTICLE GENERAL INFORMATION"
+ANY_CASE_HEADING = re.compile(HEADING, re.IGNORECASE)
+
+# Item "INFO:" value, as (?<!PREHANDLING\s)(?<!PARCEL LABEL CODE\s)INFO:\s*(.*?)(?=\s+[A-Z ]+:\s*|$)
+# (DOTALL, IGNORECASE) captured it, without re-trying the lookahead at every character
+INFO_LABEL = re.compile(r'(?<!PREHANDLING\s)(?<!PARCEL LABEL CODE\s)INFO:\s*', re.IGNORECASE)
+# Characters a following "  LABEL:" is made of: whitespace, then letters and spaces
+LABEL_RUN = re.compile(r'[\sA-Z ]+', re.IGNORECASE)
+LAST_LINE_BREAK = re.compile(r'.*[^\S ]', re.DOTALL)
+LAST_LETTER = re.compile(r'.*[A-Z]', re.DOTALL | re.IGNORECASE)
+LABEL_CHAR = re.compile(r'[A-Z ]', re.IGNORECASE)
+
+
+def line_starts(text):
+    # Offsets where ^ matches in MULTILINE mode: 0 and after every "\n" (also at the very end)
+    pos = 0
+    while True:
+        yield pos
+        pos = text.find("\n", pos) + 1
+        if not pos:
+            return
+
+
+def item_blocks(text):
+    # A block runs from a "N)" line to the next "N)" or footer line, or to the end of the text
+    blocks, start = [], None
+    for pos in line_starts(text):
+        if ITEM_MARKER.match(text, pos):
+            if start is not None:
+                blocks.append(text[start:pos])
+            start = pos
+        elif start is not None and text.startswith(FOOTER, pos):
+            blocks.append(text[start:pos])
+            start = None
+    if start is not None:
+        blocks.append(text[start:])
+    return blocks
+
+
+def product_blocks(text):
+    # A block runs from a "N)" line to the line break before the next one, to the next line
+    # starting with the (upper-case) heading, or to the end of the text
+    blocks, start = [], None
+    for pos in line_starts(text):
+        if ITEM_MARKER.match(text, pos):
+            if start is not None:
+                blocks.append(text[start:pos - 1])
+            start = pos
+        elif start is not None and text.startswith(HEADING, pos):
+            blocks.append(text[start:pos])
+            start = None
+    if start is not None:
+        blocks.append(text[start:])
+    return blocks
+
+
+def general_info_sections(text):
+    # From each heading (any case) to the next one or the end of the text
+    starts = [m.start() for m in ANY_CASE_HEADING.finditer(text)]
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+
+def _label_start(text, pos, limit):
+    # First k in [pos, limit) where \s+[A-Z ]+: matches, else limit. Such a match can only end at
+    # the colon right after a maximal run of whitespace/letters/spaces, so each run is checked once.
+    for run in LABEL_RUN.finditer(text, pos):
+        start, end = run.span()
+        if start >= limit:
+            break
+        if end >= len(text) or text[end] != ":" or not LABEL_CHAR.match(text, end - 1):
+            continue
+        # Line breaks/tabs must all come before the letters: start after the last letter
+        # that precedes the last of them, or at the first space if there are none
+        line_break = LAST_LINE_BREAK.match(text, start, end)
+        if line_break is not None:
+            letter = LAST_LETTER.match(text, start, line_break.end() - 1)
+            k = letter.end() if letter is not None else start
+        else:
+            k = text.find(" ", start, end - 1)
+            if k == -1:
+                continue
+        return min(k, limit)
+    return limit
+
+
+def info_value(block):
+    # Raw text after the item's "INFO:" label (None without one), up to the next "LABEL:" or the end
+    label = INFO_LABEL.search(block)
+    if label is None:
+        return None
+    start = label.end()
+    end = len(block)
+    if block.endswith("\n") and end - 1 >= start:
+        end -= 1
+    return block[start:_label_start(block, start, end)]
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import threading
+
+# Coordinate-based header templates (opt-in): PDF_HEADER_TEMPLATES names a JSON file like
+#
+#   {"templates": [{
+#       "name": "sok-consumer-goods",
+#       "page": 1,
+#       "match": [{"region": [370, 30, 560, 48], "contains": "PURCHASE ORDER"}],
+#       "fields": {
+#           "Order No": {"region": [370, 45, 560, 60], "pattern": "NO[:\\s]*([A-Z0-9/]+)"},
+#           "Supplier": {"region": [45, 98, 360, 124]},
+#           "Contact Person": {"region": [45, 124, 360, 137], "label": "CONTACT PERSON:"}
+#       },
+#       "required": ["Order No"]
+#   }]}
+#
+# Regions are [x0, top, x1, bottom] in PDF points from the top-left corner of the page (as
+# pdfplumber reports word positions). A field's value is the words inside its region, line by
+# line, joined with spaces; "label" is removed from the start, "pattern" keeps group 1 (or the
+# whole match) of a search over the region's lines. Fields are output in the order listed.
+# A template applies when every "match" region contains its text and every "required" field
+# has a value; otherwise the next template is tried, and with none the line-based scan runs.
+HEADER_TEMPLATES_PATH = os.environ.get("PDF_HEADER_TEMPLATES")
+
+# Words whose tops are this close (in points) are on the same line
+LINE_TOLERANCE = 3
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def _region(value, where):
+    if not (isinstance(value, (list, tuple)) and len(value) == 4 and all(isinstance(v, (int, float)) for v in value)):
+        raise TemplateError(f"{where}: region must be [x0, top, x1, bottom], got {value!r}")
+    x0, top, x1, bottom = value
+    if x1 <= x0 or bottom <= top:
+        raise TemplateError(f"{where}: empty region {value!r}")
+    return tuple(value)
+
+
+class FieldRule:
+    __slots__ = ("key", "region", "label", "pattern")
+
+    def __init__(self, key, spec, where):
+        self.key = key
+        self.region = _region(spec.get("region"), f"{where} field {key!r}")
+        self.label = spec.get("label")
+        flags = 0 if spec.get("case_sensitive") else re.IGNORECASE
+        try:
+            self.pattern = re.compile(spec["pattern"], flags) if spec.get("pattern") else None
+        except re.error as e:
+            raise TemplateError(f"{where} field {key!r}: bad pattern: {e}")
+
+    def value(self, lines):
+        if self.pattern is not None:
+            m = self.pattern.search("\n".join(lines))
+            if m is None:
+                return None
+            value = m.group(1) if m.re.groups else m.group(0)
+        else:
+            value = " ".join(lines)
+            if self.label and value.upper().startswith(self.label.upper()):
+                value = value[len(self.label):]
+        value = value.strip()
+        return value or None
+
+
+class HeaderTemplate:
+    def __init__(self, spec, position):
+        where = f"template {spec.get('name', position)!r}"
+        self.name = spec.get("name", f"template-{position}")
+        self.page = int(spec.get("page", 1)) - 1
+        if self.page < 0:
+            raise TemplateError(f"{where}: pages are numbered from 1")
+        self.match = [(_region(m.get("region"), f"{where} match"), m.get("contains", "")) for m in spec.get("match", [])]
+        fields = spec.get("fields") or {}
+        if not fields:
+            raise TemplateError(f"{where}: no fields")
+        self.fields = [FieldRule(key, rule, where) for key, rule in fields.items()]
+        self.required = list(spec.get("required", []))
+        unknown = set(self.required) - set(fields)
+        if unknown:
+            raise TemplateError(f"{where}: required fields {sorted(unknown)} are not defined")
+
+    def apply(self, doc):
+        # {field: value} when the template fits the document, else None
+        if self.page >= len(doc):
+            return None
+        for region, text in self.match:
+            if text.upper() not in " ".join(region_lines(doc, self.page, region)).upper():
+                return None
+        output = {}
+        for rule in self.fields:
+            value = rule.value(region_lines(doc, self.page, rule.region))
+            if value is not None:
+                output[rule.key] = value
+        if any(key not in output for key in self.required):
+            return None
+        return output
+
+
+def region_lines(doc, page_num, region):
+    # Text lines of the words inside a region, top to bottom
+    words = sorted(doc.region_words(page_num, region), key=lambda w: (w["top"], w["x0"]))
+    lines, current, current_top = [], [], None
+    for word in words:
+        if current and word["top"] - current_top > LINE_TOLERANCE:
+            lines.append(current)
+            current = []
+        if not current:
+            current_top = word["top"]
+        current.append(word)
+    if current:
+        lines.append(current)
+    return [" ".join(w["text"] for w in sorted(line, key=lambda w: w["x0"])) for line in lines]
+
+
+def load_templates(path):
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    specs = config.get("templates", []) if isinstance(config, dict) else config
+    return [HeaderTemplate(spec, i) for i, spec in enumerate(specs)]
+
+
+_templates = None
+_templates_lock = threading.Lock()
+
+
+def get_templates():
+    global _templates
+    with _templates_lock:
+        if _templates is None:
+            _templates = []
+            if HEADER_TEMPLATES_PATH:
+                try:
+                    _templates = load_templates(HEADER_TEMPLATES_PATH)
+                    print(f"🧭 Loaded {len(_templates)} header template(s) from {HEADER_TEMPLATES_PATH}")
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Header templates not used ({HEADER_TEMPLATES_PATH}): {e}")
+        return _templates
+
+
+def extract_header(doc):
+    # Fields from the first template that fits, or None to fall back to the line-based scan
+    for template in get_templates():
+        try:
+            output = template.apply(doc)
+        except Exception as e:
+            print(f"⚠️ Header template {template.name!r} failed: {e}")
+            continue
+        if output is not None:
+            print(f"🧭 Header read with template {template.name!r}")
+            return output
+    return None
@@ -0,0 +1,69 @@
+import io
+import os
+import time
+import importlib
+from contextlib import redirect_stdout
+
+import metrics
+
+# Warm-up at process start (API lifespan, job-pool workers), so the first request after a
+# scale-out doesn't pay for imports, regex compilation and pdfplumber's first-use setup.
+# "0" turns it off; importing this module (or api) never does any of it by itself.
+WARMUP_ENABLED = os.environ.get("PDF_WARMUP", "1") != "0"
+# Tiny PO parsed once end to end; an empty value skips the sample parse
+WARMUP_PDF = os.environ.get("PDF_WARMUP_PDF", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "warmup.pdf"))
+# Start the job pool's worker processes during warm-up instead of on the first /jobs or /batch request
+WARMUP_JOB_POOL = os.environ.get("PDF_WARMUP_JOB_POOL", "1") != "0"
+
+PARSER_MODULES = ("fields", "records", "segments", "templates", "master", "partone", "parttwo", "ocr", "pdftext", "main")
+
+STARTUP_SECONDS = metrics.REGISTRY.histogram("pdf_startup_seconds", "Warm-up time at process start, by phase", ("phase",))
+
+
+def parse_sample(path=WARMUP_PDF):
+    # One full parse of the bundled PO: pdfplumber/pdfminer set up their font and layout machinery
+    # on first use, and every parser code path gets exercised once. Its metrics are discarded.
+    import main
+    with redirect_stdout(io.StringIO()):
+        main.parse_combined_pdf(path, workers=0)
+    metrics.REGISTRY.reset()
+
+
+def warm_up(parse=True, verbose=True):
+    # {phase: seconds} for imports, sample parse and the total
+    start = time.perf_counter()
+    report = {}
+
+    # The parsers compile their patterns at module level, so importing them compiles every one
+    t = time.perf_counter()
+    for name in PARSER_MODULES:
+        importlib.import_module(name)
+    report["imports"] = time.perf_counter() - t
+
+    if parse and WARMUP_PDF:
+        t = time.perf_counter()
+        try:
+            parse_sample(WARMUP_PDF)
+        except Exception as e:
+            print(f"⚠️ Warm-up parse of {WARMUP_PDF} failed: {e}")
+        report["sample_parse"] = time.perf_counter() - t
+
+    report["total"] = time.perf_counter() - start
+    for phase, seconds in report.items():
+        STARTUP_SECONDS.observe(seconds, phase)
+    if verbose:
+        phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in report.items() if phase != "total")
+        print(f"🔥 Warm-up done in {report['total']:.3f}s ({phases})")
+    return report
+
+
+def warm_worker():
+    # ProcessPoolExecutor initializer: imports only, quietly, in each new worker
+    if WARMUP_ENABLED:
+        warm_up(parse=False, verbose=False)
+
+
+def ping():
+    # No-op task used to make the job pool start its workers
+    return os.getpid()
+